@@ -1,20 +1,41 @@
 import os
+import re
+import sys
+import gzip
+import hmac
+import asyncio
 import json
+import math
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import functools
+import threading
 import requests
+import numpy as np
 
-from datetime import datetime, timezone, timedelta
+from datetime import date as date_cls, datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 from typing import Any, Dict, Optional, Tuple
 from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Query
-from sqlalchemy import create_engine, text
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, event, text
 
 # ==========================================================
 # CONFIG
 # ==========================================================
 TR_TZ = ZoneInfo("Europe/Istanbul")
 
+logger = logging.getLogger("matchmotor")
+
 DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
 # IMPORTANT:
 # - Neon connection strings are usually already in the correct form.
@@ -35,12 +56,269 @@ FLASHSCORE_RAPIDAPI_HOST = os.getenv(
 ).strip()
 
 # Flashscore matches endpoint path (in case RapidAPI changes / you use a different provider)
-# Default guess: football/matches/{YYYY-MM-DD}
+# {sport} = Flashscore sport id (1=football), {date} = YYYY-MM-DD
 FLASHSCORE_MATCHES_PATH_TEMPLATE = os.getenv(
     "FLASHSCORE_MATCHES_PATH_TEMPLATE",
-    "match/list/1/{date}"
+    "match/list/{sport}/{date}"
 ).strip().lstrip("/")
 
+DEFAULT_SPORT_ID = 1
+
+# Ingest edilebilen sporlar: sport id -> maç sonucu market tipi
+#   1x2 = 1 / X / 2 oranlarının üçü de gerekli (futbol gibi)
+#   12  = beraberliksiz iki yollu market; 1 ve 2 yeterli, X yoksa ms0 NULL yazılır.
+#         p1/p0/p2 (generated) 1X2 gerektirdiği için bu sporlar odds-buckets'ta ve
+#         rating'lerde (RATING_SPORT_IDS) kullanılmaz; sadece ham oran + sonuç saklanır.
+# Listede olmayan sporlar sync / kuyruk tarafından reddedilir. Örn: "1:1x2,3:12"
+FLASHSCORE_SPORT_MARKETS = {
+    int(sid): market.strip().lower()
+    for sid, market in (
+        item.split(":", 1)
+        for item in os.getenv("FLASHSCORE_SPORT_MARKETS", "1:1x2").split(",")
+        if item.strip()
+    )
+}
+if not set(FLASHSCORE_SPORT_MARKETS.values()) <= {"1x2", "12"}:
+    raise RuntimeError("FLASHSCORE_SPORT_MARKETS market tipi 1x2 veya 12 olmalı")
+
+# Ham upstream response arşivi (content-addressed, gzip). "" => kapalı
+RAW_ARCHIVE_DIR = os.getenv(
+    "RAW_ARCHIVE_DIR",
+    str(Path(__file__).resolve().parents[2] / "data" / "raw_archive"),
+).strip()
+# Dosyalar yazan process'in diskinde durur, index (raw_api_archive) ise ortak Postgres'te.
+# Birden fazla node'da worker çalışıyorsa RAW_ARCHIVE_DIR tüm node'lara bağlı kalıcı bir volume
+# olmalı ve RAW_ARCHIVE_NODE hepsinde aynı verilmeli (ephemeral diskte dosyalar deploy'da silinir).
+# Her index satırı yazıldığı arşivi (node:dir) tutar; replay başka arşivin dosyalarını reddeder.
+RAW_ARCHIVE_NODE = (os.getenv("RAW_ARCHIVE_NODE") or socket.gethostname()).strip()
+RAW_ARCHIVE_ROOT = f"{RAW_ARCHIVE_NODE}:{RAW_ARCHIVE_DIR}"
+
+# Ingest queue (flash_ingest_queue): (sport, date) shard'ları, worker'lar SKIP LOCKED ile alır
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+INGEST_LOCK_TIMEOUT_SEC = int(os.getenv("INGEST_LOCK_TIMEOUT_SEC", "900"))
+INGEST_RETRY_BACKOFF_SEC = int(os.getenv("INGEST_RETRY_BACKOFF_SEC", "60"))
+
+# Feature store (flash_team_features): form / son N maç penceresi
+TEAM_FORM_LAST_N = int(os.getenv("TEAM_FORM_LAST_N", "5"))
+
+# Rating engine (Elo + Poisson attack/defence), takım x turnuva bazında
+ELO_INIT = float(os.getenv("ELO_INIT", "1500"))
+ELO_K = float(os.getenv("ELO_K", "20"))
+ELO_HOME_ADV = float(os.getenv("ELO_HOME_ADV", "60"))
+POISSON_TEAM_DECAY = float(os.getenv("POISSON_TEAM_DECAY", "0.97"))       # takım başına, maç başına
+POISSON_LEAGUE_DECAY = float(os.getenv("POISSON_LEAGUE_DECAY", "0.995"))  # turnuva başına, maç başına
+POISSON_PRIOR_MATCHES = float(os.getenv("POISSON_PRIOR_MATCHES", "3"))    # lig ortalamasına shrink
+POISSON_MAX_GOALS = 10
+# incremental güncellemenin tek seferde işlediği en fazla maç (kalanlar sonraki turda)
+RATINGS_INCREMENTAL_BATCH = int(os.getenv("RATINGS_INCREMENTAL_BATCH", "20000"))
+# Model futbola göre ayarlı (gol farkı çarpanı, POISSON_MAX_GOALS): sadece bu sporlar rating'e girer,
+# diğer sporların maçları rated_at ile işaretlenir ama state'e uygulanmaz. Hepsi 1x2 market olmalı.
+RATING_SPORT_IDS = {int(x) for x in os.getenv("RATING_SPORT_IDS", "1").split(",") if x.strip()}
+if any(FLASHSCORE_SPORT_MARKETS.get(sid, "1x2") != "1x2" for sid in RATING_SPORT_IDS):
+    raise RuntimeError("RATING_SPORT_IDS sadece 1x2 market sporlarını içerebilir")
+
+# Oran bucket'ı: floor(oran * ODDS_BUCKET_SCALE) -> 10 = 0.10 genişlik (18 => 1.80-1.89)
+# Generated column ifadesine gömülü; değiştirmek kolonların drop/re-create edilmesini gerektirir.
+ODDS_BUCKET_SCALE = 10
+
+# Profiling / slow request log
+# - ?profile=1 (veya X-Profile: 1) + X-Admin-Token => sampling profil + span ağacı, request_profiles'a
+#   yazılır (son PROFILE_STORE_SIZE adet); /admin/profiles her uvicorn worker'ından okunabilir
+# - ?profile=inline => JSON response'a "_profile" olarak eklenir
+# - SLOW_REQUEST_MS > 0 => bu süreyi aşan isteklerin span ağacı slow_request_log'a yazılır
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "50"))
+
+# ==========================================================
+# TRACING  (istek bazlı span ağacı + sampling profiler)
+# ==========================================================
+# Aktif bir trace yoksa span()/traced() sadece bir ContextVar okuması yapar.
+# ContextVar'lar Starlette threadpool'una kopyalandığı için sync endpoint'ler de izlenir.
+_trace_var: ContextVar[Optional["RequestTrace"]] = ContextVar("matchmotor_trace", default=None)
+_span_var: ContextVar[Optional["SpanNode"]] = ContextVar("matchmotor_span", default=None)
+
+class SpanNode:
+    """Aynı parent altındaki aynı isimli span'lar tek düğümde toplanır (count + toplam süre)."""
+    __slots__ = ("name", "count", "total", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.children: Dict[str, "SpanNode"] = {}
+
+    def child(self, name: str) -> "SpanNode":
+        node = self.children.get(name)
+        if node is None:
+            node = SpanNode(name)
+            self.children[name] = node
+        return node
+
+    def to_dict(self) -> dict:
+        children = sorted(self.children.values(), key=lambda c: c.total, reverse=True)
+        return {
+            "name": self.name,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "self_ms": round(max(0.0, self.total - sum(c.total for c in children)) * 1000, 3),
+            "children": [c.to_dict() for c in children],
+        }
+
+class RequestTrace:
+    def __init__(self, method: str, path: str, query: str, *, sampling: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.query = query
+        self.sampling = sampling
+        self.started_at = datetime.now(timezone.utc)
+        self.root = SpanNode("request")
+        self.thread_ids: set = set()
+        self.samples: Counter = Counter()
+        self.status_code: Optional[int] = None
+
+    def to_dict(self, top: int = 30) -> dict:
+        out = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.root.total * 1000, 3),
+            "spans": self.root.to_dict(),
+        }
+        if self.sampling:
+            n = sum(self.samples.values())
+            leaf = Counter()
+            for stack, c in self.samples.items():
+                leaf[stack.rsplit(";", 1)[-1]] += c
+            out["profile"] = {
+                "interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+                "samples": n,
+                "top_stacks": [
+                    {"stack": st, "count": c, "pct": round(100.0 * c / n, 1)}
+                    for st, c in self.samples.most_common(top)
+                ],
+                "top_functions": [
+                    {"function": fn, "count": c, "pct": round(100.0 * c / n, 1)}
+                    for fn, c in leaf.most_common(top)
+                ],
+            }
+        return out
+
+class _Span:
+    __slots__ = ("name", "node", "token", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.node = None
+
+    def __enter__(self):
+        trace = _trace_var.get()
+        if trace is None:
+            return self
+        trace.thread_ids.add(threading.get_ident())
+        parent = _span_var.get() or trace.root
+        self.node = parent.child(self.name)
+        self.token = _span_var.set(self.node)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.node is not None:
+            self.node.total += time.perf_counter() - self.t0
+            self.node.count += 1
+            _span_var.reset(self.token)
+        return False
+
+def span(name: str) -> _Span:
+    """with span("http.flashscore"): ...  (trace yoksa no-op)"""
+    return _Span(name)
+
+def traced(name: str):
+    """Sık çağrılan helper'lar için decorator; trace yoksa doğrudan fonksiyonu çağırır."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace_var.get() is None:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+class _TracedRoute(APIRoute):
+    """
+    Sync endpoint'ler threadpool'da çalışır: ilk span / DB event'inden önceki iş de örneklensin
+    diye endpoint thread'i çağrının başında trace'e kaydedilir.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if call is not None and not asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            def endpoint(*args, **kwargs):
+                trace = _trace_var.get()
+                if trace is not None:
+                    trace.thread_ids.add(threading.get_ident())
+                return call(*args, **kwargs)
+            self.dependant.call = endpoint
+        return super().get_route_handler()
+
+class _StackSampler(threading.Thread):
+    """İsteğe bağlı thread'lerin stack'ini sabit aralıkla örnekler (collapsed stack sayacı)."""
+
+    def __init__(self, trace: RequestTrace, interval_ms: float):
+        super().__init__(name=f"profiler-{trace.id}", daemon=True)
+        self.trace = trace
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            frames = sys._current_frames()
+            for tid in list(self.trace.thread_ids):
+                f = frames.get(tid)
+                stack = []
+                while f is not None and len(stack) < 64:
+                    code = f.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{f.f_lineno})")
+                    f = f.f_back
+                if stack:
+                    self.trace.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join(timeout=1.0)
+
+def _trace_before_cursor(conn, cursor, statement, parameters, context, executemany):
+    if _trace_var.get() is not None:
+        conn.info.setdefault("trace_t0", []).append(time.perf_counter())
+
+def _trace_after_cursor(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace_var.get()
+    stack = conn.info.get("trace_t0")
+    if trace is None or not stack:
+        return
+    dt = time.perf_counter() - stack.pop()
+    trace.thread_ids.add(threading.get_ident())
+    node = (_span_var.get() or trace.root).child("db.execute")
+    node.total += dt
+    node.count += 1
+
+def _trace_db_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("trace_t0"):
+        conn.info["trace_t0"].pop()
+
+if engine is not None:
+    event.listen(engine, "before_cursor_execute", _trace_before_cursor)
+    event.listen(engine, "after_cursor_execute", _trace_after_cursor)
+    event.listen(engine, "handle_error", _trace_db_error)
+
 # ==========================================================
 # HELPERS
 # ==========================================================
@@ -58,6 +336,61 @@ def _dump_json(obj: Any) -> str:
     except Exception:
         return "{}"
 
+_YMD_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _archive_object_path(sha256: str) -> Path:
+    return Path(RAW_ARCHIVE_DIR) / "objects" / sha256[:2] / f"{sha256}.json.gz"
+
+def archive_raw_response(source: str, path: str, params: Optional[dict], content: bytes, http_status: int) -> Optional[str]:
+    """
+    Ham response'u diske (sha256 ile adreslenmiş, gzip) yazar ve raw_api_archive'a index satırı ekler.
+    endpoint = path içindeki tarih '{date}' ile değiştirilmiş hali (örn: match/list/1/{date}).
+    Arşiv hatası ingest'i durdurmaz.
+    """
+    if not RAW_ARCHIVE_DIR:
+        return None
+    try:
+        sha256 = hashlib.sha256(content).hexdigest()
+        obj = _archive_object_path(sha256)
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+            with gzip.open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, obj)
+
+        m = _YMD_RE.search(path)
+        date = (params or {}).get("date") or (m.group(0) if m else None)
+        endpoint = _YMD_RE.sub("{date}", path.strip("/"))
+
+        if engine is not None:
+            ensure_schema()
+            with engine.begin() as conn:
+                conn.execute(
+                    text("""
+                        INSERT INTO raw_api_archive (source, endpoint, date, params_json, sha256, size_bytes, http_status, archive_root)
+                        VALUES (:source, :endpoint, :date, :params_json, :sha256, :size_bytes, :http_status, :archive_root)
+                    """),
+                    {
+                        "source": source,
+                        "endpoint": endpoint,
+                        "date": date,
+                        "params_json": _dump_json(params or {}),
+                        "sha256": sha256,
+                        "size_bytes": len(content),
+                        "http_status": http_status,
+                        "archive_root": RAW_ARCHIVE_ROOT,
+                    },
+                )
+        return sha256
+    except Exception as e:
+        logger.warning("archive: %s %s yazılamadı: %r", source, path, e)
+        return None
+
+def load_archived_response(sha256: str) -> Any:
+    with gzip.open(_archive_object_path(sha256), "rb") as f:
+        return json.loads(f.read())
+
 def flashscore_get(path: str, *, params: Optional[dict] = None) -> dict:
     """
     Flashscore RapidAPI GET helper.
@@ -72,10 +405,15 @@ def flashscore_get(path: str, *, params: Optional[dict] = None) -> dict:
     }
 
     try:
-        r = requests.get(url, headers=headers, params=(params or {}), timeout=30)
+        with span("http.flashscore"):
+            r = requests.get(url, headers=headers, params=(params or {}), timeout=30)
     except requests.RequestException as e:
         raise HTTPException(status_code=502, detail=f"Flashscore bağlantı hatası: {e}")
 
+    # hata response'ları da arşivlenir (http_status ile); replay sadece < 400 olanları okur
+    with span("archive.write"):
+        archive_raw_response("flashscore", path, params, r.content, r.status_code)
+
     if r.status_code >= 400:
         try:
             body = r.json()
@@ -84,7 +422,8 @@ def flashscore_get(path: str, *, params: Optional[dict] = None) -> dict:
         raise HTTPException(status_code=r.status_code, detail={"url": str(r.url), "body": body})
 
     try:
-        return r.json()
+        with span("json.decode"):
+            return r.json()
     except Exception:
         raise HTTPException(status_code=502, detail={"url": str(r.url), "body": r.text})
 
@@ -96,6 +435,7 @@ def classify_stage(stage: Optional[str]) -> str:
     # Keep original if it looks meaningful, else Title-case
     return s[:1].upper() + s[1:]
 
+@traced("tz.fs_ts_to_tr")
 def _fs_ts_to_tr(ts: Any) -> Optional[datetime]:
     """
     Flashscore timestamps are commonly epoch seconds.
@@ -109,6 +449,19 @@ def _fs_ts_to_tr(ts: Any) -> Optional[datetime]:
         return None
     return datetime.fromtimestamp(ts_i, tz=timezone.utc).astimezone(TR_TZ)
 
+def _fs_payload_days(blocks: list) -> set:
+    """match/list payload'undaki maçların TR tarihleri."""
+    days = set()
+    for blk in blocks:
+        matches = blk.get("matches") if isinstance(blk, dict) else None
+        if not isinstance(matches, list):
+            continue
+        for m in matches:
+            dt_tr = _fs_ts_to_tr(m.get("timestamp")) if isinstance(m, dict) else None
+            if dt_tr is not None:
+                days.add(dt_tr.date())
+    return days
+
 def _fs_is_finished(match_obj: dict) -> bool:
     """
     Decide if a match is finished.
@@ -203,6 +556,7 @@ def _fs_pick_ms_odds(match_obj: dict) -> Tuple[Optional[float], Optional[float],
     # Sometimes odds are under bookmakers[0]['markets'][...]
     return None, None, None
 
+@traced("coerce.safe_float")
 def _safe_float(v):
     """None/boş/str/num -> float veya None"""
     if v is None:
@@ -217,6 +571,7 @@ def _safe_float(v):
         return None
 
 
+@traced("coerce.safe_int")
 def _safe_int(v):
     """None/boş/str/num -> int veya None"""
     if v is None:
@@ -230,42 +585,461 @@ def _safe_int(v):
     except Exception:
         return None
 
+def _sport_market(sport_id: int) -> str:
+    market = FLASHSCORE_SPORT_MARKETS.get(sport_id)
+    if market is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sport_id={sport_id} desteklenmiyor (FLASHSCORE_SPORT_MARKETS: {FLASHSCORE_SPORT_MARKETS})",
+        )
+    return market
+
+def _parse_ymd(value: str, field: str) -> date_cls:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"{field} formatı YYYY-MM-DD olmalı")
+
 # ==========================================================
 # DB SCHEMA
 # ==========================================================
-def ensure_schema():
+_MS_ALL_POSITIVE = "(ms1 > 0 AND ms0 > 0 AND ms2 > 0)"
+_MS_OVERROUND = "(1.0 / ms1 + 1.0 / ms0 + 1.0 / ms2)"
+
+# flash_finished_ms computed (STORED generated) kolonları: (ad, tip, ifade)
+# - ms_overround: bookmaker marjı dahil toplam olasılık
+# - p1/p0/p2: marjı çıkarılmış (normalize) implied olasılıklar
+# - ms*_bucket: ayrık oran bucket'ı (ODDS_BUCKET_SCALE)
+# - result_1x2: FT skordan '1' / 'X' / '2'
+FINISHED_MS_COMPUTED_COLUMNS = [
+    ("ms_overround", "DOUBLE PRECISION", f"CASE WHEN {_MS_ALL_POSITIVE} THEN {_MS_OVERROUND} END"),
+    ("p1", "DOUBLE PRECISION", f"CASE WHEN {_MS_ALL_POSITIVE} THEN (1.0 / ms1) / {_MS_OVERROUND} END"),
+    ("p0", "DOUBLE PRECISION", f"CASE WHEN {_MS_ALL_POSITIVE} THEN (1.0 / ms0) / {_MS_OVERROUND} END"),
+    ("p2", "DOUBLE PRECISION", f"CASE WHEN {_MS_ALL_POSITIVE} THEN (1.0 / ms2) / {_MS_OVERROUND} END"),
+    ("ms1_bucket", "INT", f"CAST(floor(ms1 * {ODDS_BUCKET_SCALE}) AS INT)"),
+    ("ms0_bucket", "INT", f"CAST(floor(ms0 * {ODDS_BUCKET_SCALE}) AS INT)"),
+    ("ms2_bucket", "INT", f"CAST(floor(ms2 * {ODDS_BUCKET_SCALE}) AS INT)"),
+    (
+        "result_1x2",
+        "TEXT",
+        "CASE WHEN ft_home > ft_away THEN '1' WHEN ft_home = ft_away THEN 'X' WHEN ft_home < ft_away THEN '2' END",
+    ),
+]
+
+def _odds_bucket_floor(odds: float) -> int:
+    # round: 0.29 * 100 = 28.999... gibi float hatalarını bucket kenarında düzeltir
+    return math.floor(round(odds * ODDS_BUCKET_SCALE, 9))
+
+# market -> (oran kolonu, bucket kolonu, implied olasılık kolonu, kazanan sonuç)
+ODDS_MARKETS = {
+    "ms1": ("ms1", "ms1_bucket", "p1", "1"),
+    "ms0": ("ms0", "ms0_bucket", "p0", "X"),
+    "ms2": ("ms2", "ms2_bucket", "p2", "2"),
+}
+
+_SCHEMA_LOCK_KEY = 3101
+
+def _month_start(d: date_cls) -> date_cls:
+    return d.replace(day=1)
+
+def _next_month(d: date_cls) -> date_cls:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _finished_ms_create_sql(table: str) -> str:
+    computed = ",\n                ".join(
+        f"{name} {col_type} GENERATED ALWAYS AS ({expr}) STORED"
+        for name, col_type, expr in FINISHED_MS_COMPUTED_COLUMNS
+    )
+    return f"""
+        CREATE TABLE {table} (
+            id BIGINT NOT NULL DEFAULT nextval('flash_finished_ms_id_seq'),
+            flash_match_id TEXT NOT NULL,
+            sport_id INT NOT NULL DEFAULT 1,
+
+            match_date DATE NOT NULL,  -- partition key (TR tarihi, date ile aynı gün)
+            match_datetime_tr TEXT,
+            date TEXT,
+            time TEXT,
+
+            country_name TEXT,
+            tournament_name TEXT,
+
+            home TEXT,
+            away TEXT,
+
+            ft_home INT,
+            ft_away INT,
+
+            ms1 DOUBLE PRECISION,
+            ms0 DOUBLE PRECISION,
+            ms2 DOUBLE PRECISION,
+
+            fetched_at_tr TEXT,
+            raw_json TEXT,
+
+            rated_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+            {computed},
+
+            PRIMARY KEY (id, match_date),
+            -- partition'lı tabloda UNIQUE partition key'i içermek zorunda;
+            -- flash_match_id'nin global tekilliği flash_match_ids tablosunda tutulur
+            UNIQUE (flash_match_id, match_date)
+        ) PARTITION BY RANGE (match_date);
+    """
+
+# partition'a kopyalanan (generated olmayan) kolonlar
+_FINISHED_MS_COPY_COLUMNS = [
+    "id", "flash_match_id", "sport_id",
+    "match_datetime_tr", "date", "time",
+    "country_name", "tournament_name", "home", "away",
+    "ft_home", "ft_away", "ms1", "ms0", "ms2",
+    "fetched_at_tr", "raw_json", "rated_at", "updated_at",
+]
+
+def _create_finished_ms_partitions(conn, months) -> int:
+    """Verilen aylar (ayın 1'i) için flash_finished_ms_pYYYYMM partition'larını oluşturur."""
+    for m in sorted(months):
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS flash_finished_ms_p{m:%Y%m}
+            PARTITION OF flash_finished_ms
+            FOR VALUES FROM ('{m.isoformat()}') TO ('{_next_month(m).isoformat()}');
+        """))
+    return len(months)
+
+_finished_ms_partitions: set = set()
+
+def ensure_finished_ms_partitions(days) -> int:
+    """
+    Yazmadan önce gereken aylık partition'ları kısa, ayrı bir transaction'da açar
+    (partition DDL'i parent'ı kilitler; uzun insert transaction'ı içinde yapılmaz).
+    """
+    months = {_month_start(d) for d in days} - _finished_ms_partitions
+    if not months:
+        return 0
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _SCHEMA_LOCK_KEY})
+        _create_finished_ms_partitions(conn, months)
+    _finished_ms_partitions.update(months)
+    return len(months)
+
+def _migrate_finished_ms_to_partitioned(conn) -> None:
+    """
+    Eski (partition'sız) flash_finished_ms'i aylık partition'lı tabloya taşır.
+    id'ler ve sequence korunur; index'ler veri kopyalandıktan sonra kurulur.
+    """
+    # eski şemalarda eksik olabilecek kolonlar (kopyalama listesi için)
+    conn.execute(text("""ALTER TABLE flash_finished_ms ADD COLUMN IF NOT EXISTS sport_id INT NOT NULL DEFAULT 1;"""))
+    conn.execute(text("""ALTER TABLE flash_finished_ms ADD COLUMN IF NOT EXISTS rated_at TIMESTAMPTZ;"""))
+
+    match_date_expr = "COALESCE(CAST(NULLIF(date, '') AS DATE), CAST(updated_at AS DATE))"
+
+    conn.execute(text(_finished_ms_create_sql("flash_finished_ms_new")))
+    conn.execute(text("ALTER TABLE flash_finished_ms RENAME TO flash_finished_ms_legacy"))
+    conn.execute(text("ALTER TABLE flash_finished_ms_new RENAME TO flash_finished_ms"))
+
+    months = {
+        r[0]
+        for r in conn.execute(text(f"""
+            SELECT DISTINCT CAST(date_trunc('month', {match_date_expr}) AS DATE)
+            FROM flash_finished_ms_legacy
+        """))
+    }
+    _create_finished_ms_partitions(conn, months)
+
+    cols = ", ".join(_FINISHED_MS_COPY_COLUMNS)
+    conn.execute(text(f"""
+        INSERT INTO flash_finished_ms ({cols}, match_date)
+        SELECT {cols}, {match_date_expr}
+        FROM flash_finished_ms_legacy
+    """))
+
+    # eski tabloda flash_match_id global UNIQUE idi; lookup ON CONFLICT'e takılmaz
+    conn.execute(text("""
+        INSERT INTO flash_match_ids (flash_match_id, match_date)
+        SELECT flash_match_id, match_date FROM flash_finished_ms
+        ON CONFLICT (flash_match_id) DO NOTHING
+    """))
+
+    # sequence eski tablonun id kolonuna bağlı; drop ile silinmesin
+    conn.execute(text("ALTER SEQUENCE flash_finished_ms_id_seq OWNED BY NONE"))
+    conn.execute(text("DROP TABLE flash_finished_ms_legacy"))
+    conn.execute(text("ALTER TABLE flash_finished_ms RENAME CONSTRAINT flash_finished_ms_new_pkey TO flash_finished_ms_pkey"))
+    conn.execute(text("""
+        ALTER TABLE flash_finished_ms
+        RENAME CONSTRAINT flash_finished_ms_new_flash_match_id_match_date_key TO flash_finished_ms_flash_match_id_match_date_key
+    """))
+
+def _backfill_flash_match_ids(conn) -> None:
+    """
+    Lookup tablosu olmadan partition'a geçmiş kurulumlar için: her flash_match_id'nin en son
+    güncellenen satırını lookup'a yazar, tarih kaymasıyla başka partition'da oluşmuş kopyaları siler.
+    """
+    conn.execute(text("""
+        INSERT INTO flash_match_ids (flash_match_id, match_date)
+        SELECT DISTINCT ON (flash_match_id) flash_match_id, match_date
+        FROM flash_finished_ms
+        ORDER BY flash_match_id, updated_at DESC, id DESC
+        ON CONFLICT (flash_match_id) DO NOTHING
+    """))
+    conn.execute(text("""
+        DELETE FROM flash_finished_ms f
+        USING flash_match_ids l
+        WHERE f.flash_match_id = l.flash_match_id AND f.match_date <> l.match_date
+    """))
+
+_schema_ready = False
+
+def ensure_schema(*, migrate: bool = False):
+    """
+    Şemayı kurar (IF NOT EXISTS). Veri taşıyan migration'lar sadece migrate=True ile
+    (python manage.py migrate) çalışır; API / worker startup'ında uzun kopyalama yapılmaz,
+    eski şema bulunursa hata verilir.
+    """
+    global _schema_ready
     _require_db()
+    # ALTER TABLE ... IF NOT EXISTS de kilit alıyor; process başına bir kez yeterli
+    if _schema_ready and not migrate:
+        return
     with engine.begin() as conn:
+        # aynı anda açılan API / worker process'leri migration'ı yarıştırmasın
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _SCHEMA_LOCK_KEY})
+
+        # flash_match_id -> match_date: partition'lar arası global tekillik + pruning'li lookup
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS flash_match_ids (
+                flash_match_id TEXT PRIMARY KEY,
+                match_date DATE NOT NULL
+            );
+        """))
+
+        # flash_finished_ms: match_date'e göre aylık RANGE partition
+        conn.execute(text("""CREATE SEQUENCE IF NOT EXISTS flash_finished_ms_id_seq;"""))
+        relkind = conn.execute(text("""
+            SELECT c.relkind
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = 'flash_finished_ms' AND n.nspname = current_schema()
+        """)).scalar()
+        if relkind is None:
+            conn.execute(text(_finished_ms_create_sql("flash_finished_ms")))
+        elif relkind == "r":
+            if not migrate:
+                raise RuntimeError(
+                    "flash_finished_ms partition'sız (eski şema); önce `python manage.py migrate` çalıştırın"
+                )
+            _migrate_finished_ms_to_partitioned(conn)
+        elif migrate:
+            _backfill_flash_match_ids(conn)
+        elif conn.execute(text("""
+            SELECT EXISTS (SELECT 1 FROM flash_finished_ms)
+               AND NOT EXISTS (SELECT 1 FROM flash_match_ids)
+        """)).scalar():
+            raise RuntimeError(
+                "flash_match_ids boş ama flash_finished_ms dolu; önce `python manage.py migrate` çalıştırın"
+            )
+
+        today_tr = datetime.now(TR_TZ).date()
+        _create_finished_ms_partitions(conn, {_month_start(today_tr), _next_month(today_tr)})
+
+        # zaman kolonları fiziksel sırayla (tarih tarih sync) geldiği için BRIN yeterli ve çok küçük
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_match_date_brin ON flash_finished_ms USING BRIN (match_date);"""))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_fetched_brin ON flash_finished_ms USING BRIN (fetched_at_tr);"""))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_updated_brin ON flash_finished_ms USING BRIN (updated_at);"""))
+
+        # (sport, date) iş kuyruğu
         conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS flash_finished_ms (
+            CREATE TABLE IF NOT EXISTS flash_ingest_queue (
                 id BIGSERIAL PRIMARY KEY,
-                flash_match_id TEXT NOT NULL UNIQUE,
+                sport_id INT NOT NULL,
+                date TEXT NOT NULL,
 
-                match_datetime_tr TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending | running | done | failed | dead
+                priority INT NOT NULL DEFAULT 0,
+                attempts INT NOT NULL DEFAULT 0,
+                max_attempts INT NOT NULL DEFAULT 5,
+
+                locked_by TEXT,
+                locked_at TIMESTAMPTZ,
+                next_run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+                last_error TEXT,
+                stats_json TEXT,
+                duration_ms INT,
+
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                finished_at TIMESTAMPTZ,
+
+                UNIQUE (sport_id, date)
+            );
+        """))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_ingest_queue_claim ON flash_ingest_queue(status, next_run_at);"""))
+
+        # takım bazlı feature store (flash_finished_ms'ten türetilir)
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_home ON flash_finished_ms(sport_id, home);"""))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_away ON flash_finished_ms(sport_id, away);"""))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS flash_team_features (
+                sport_id INT NOT NULL,
+                team TEXT NOT NULL,
+
+                played INT NOT NULL DEFAULT 0,
+                wins INT NOT NULL DEFAULT 0,
+                draws INT NOT NULL DEFAULT 0,
+                losses INT NOT NULL DEFAULT 0,
+                goals_for INT NOT NULL DEFAULT 0,
+                goals_against INT NOT NULL DEFAULT 0,
+
+                home_played INT NOT NULL DEFAULT 0,
+                home_wins INT NOT NULL DEFAULT 0,
+                home_draws INT NOT NULL DEFAULT 0,
+                home_losses INT NOT NULL DEFAULT 0,
+                home_goals_for INT NOT NULL DEFAULT 0,
+                home_goals_against INT NOT NULL DEFAULT 0,
+
+                away_played INT NOT NULL DEFAULT 0,
+                away_wins INT NOT NULL DEFAULT 0,
+                away_draws INT NOT NULL DEFAULT 0,
+                away_losses INT NOT NULL DEFAULT 0,
+                away_goals_for INT NOT NULL DEFAULT 0,
+                away_goals_against INT NOT NULL DEFAULT 0,
+
+                -- kapanış oranları (takım açısından: kazanma / beraberlik / kaybetme)
+                avg_odds_win DOUBLE PRECISION,
+                avg_odds_draw DOUBLE PRECISION,
+                avg_odds_loss DOUBLE PRECISION,
+                home_avg_odds_win DOUBLE PRECISION,
+                away_avg_odds_win DOUBLE PRECISION,
+
+                -- son N maç (en yeni solda, örn: WDLWW)
+                form_n INT NOT NULL DEFAULT 0,
+                form TEXT,
+                last_n_played INT NOT NULL DEFAULT 0,
+                last_n_points INT NOT NULL DEFAULT 0,
+                last_n_goals_for INT NOT NULL DEFAULT 0,
+                last_n_goals_against INT NOT NULL DEFAULT 0,
+                last_n_avg_odds_win DOUBLE PRECISION,
+
+                last_match_datetime_tr TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+                PRIMARY KEY (sport_id, team)
+            );
+        """))
+
+        # bucket-stats için covering index'ler (implied olasılık / bucket kolonları tablo DDL'inde)
+        for market, (_, bucket_col, _, _) in ODDS_MARKETS.items():
+            conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_{bucket_col}
+                ON flash_finished_ms(sport_id, {bucket_col}, result_1x2) INCLUDE (p1, p0, p2);
+            """))
+
+        # ham response arşivi index'i (dosyalar RAW_ARCHIVE_DIR altında)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS raw_api_archive (
+                id BIGSERIAL PRIMARY KEY,
+                source TEXT NOT NULL,      -- flashscore | nosy
+                endpoint TEXT NOT NULL,    -- örn: match/list/1/{date}
                 date TEXT,
-                time TEXT,
+                params_json TEXT,
+                sha256 TEXT NOT NULL,
+                size_bytes INT NOT NULL,
+                http_status INT,
+                fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """))
+        conn.execute(text("""ALTER TABLE raw_api_archive ADD COLUMN IF NOT EXISTS archive_root TEXT;"""))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_raw_api_archive_lookup ON raw_api_archive(source, endpoint, date, fetched_at DESC);"""))
+
+        # SLOW_REQUEST_MS'i aşan isteklerin span ağaçları
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS slow_request_log (
+                id BIGSERIAL PRIMARY KEY,
+                trace_id TEXT NOT NULL,
+                method TEXT NOT NULL,
+                path TEXT NOT NULL,
+                query TEXT,
+                status_code INT,
+                duration_ms DOUBLE PRECISION NOT NULL,
+                trace_json TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_slow_request_log_created ON slow_request_log(created_at DESC);"""))
+
+        # ?profile=1 ile alınan profiller (process'ler arası paylaşılır)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS request_profiles (
+                id TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                path TEXT NOT NULL,
+                query TEXT,
+                status_code INT,
+                duration_ms DOUBLE PRECISION NOT NULL,
+                profile_json TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_request_profiles_created ON request_profiles(created_at DESC);"""))
+
+        # rating engine: state tabloları checkpoint görevi görür, rated_at işlenen maçları işaretler
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_unrated ON flash_finished_ms(id) WHERE rated_at IS NULL;"""))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS team_ratings (
+                sport_id INT NOT NULL,
+                tournament_name TEXT NOT NULL,
+                team TEXT NOT NULL,
+
+                elo DOUBLE PRECISION NOT NULL,
+                games INT NOT NULL DEFAULT 0,
 
-                country_name TEXT,
-                tournament_name TEXT,
+                -- üstel ağırlıklı (POISSON_TEAM_DECAY) atılan / yenen gol ve maç sayısı
+                gf_w DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ga_w DOUBLE PRECISION NOT NULL DEFAULT 0,
+                n_w DOUBLE PRECISION NOT NULL DEFAULT 0,
 
-                home TEXT,
-                away TEXT,
+                last_match_datetime_tr TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
 
-                ft_home INT,
-                ft_away INT,
+                PRIMARY KEY (sport_id, tournament_name, team)
+            );
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS tournament_rating_stats (
+                sport_id INT NOT NULL,
+                tournament_name TEXT NOT NULL,
 
-                ms1 DOUBLE PRECISION,
-                ms0 DOUBLE PRECISION,
-                ms2 DOUBLE PRECISION,
+                home_goals_w DOUBLE PRECISION NOT NULL DEFAULT 0,
+                away_goals_w DOUBLE PRECISION NOT NULL DEFAULT 0,
+                n_w DOUBLE PRECISION NOT NULL DEFAULT 0,
+                matches INT NOT NULL DEFAULT 0,
 
-                fetched_at_tr TEXT,
-                raw_json TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
 
-                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                PRIMARY KEY (sport_id, tournament_name)
             );
         """))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_date ON flash_finished_ms(date);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_flash_finished_ms_fetched ON flash_finished_ms(fetched_at_tr);"""))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS rating_checkpoints (
+                engine TEXT PRIMARY KEY,
+                processed BIGINT NOT NULL DEFAULT 0,
+                last_match_datetime_tr TEXT,
+                params_json TEXT,
+                rebuild_required BOOLEAN NOT NULL DEFAULT FALSE,
+                last_run_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """))
+        conn.execute(text("""ALTER TABLE rating_checkpoints ADD COLUMN IF NOT EXISTS rebuild_required BOOLEAN NOT NULL DEFAULT FALSE;"""))
+        if relkind is None:
+            # boş geçmiş: incremental güncelleme baştan çalışabilir (bkz. ratings_update_incremental)
+            conn.execute(
+                text("INSERT INTO rating_checkpoints (engine) VALUES (:engine) ON CONFLICT (engine) DO NOTHING"),
+                {"engine": RATING_ENGINE_NAME},
+            )
+
+    _schema_ready = True
 
 # ==========================================================
 # APP
@@ -275,6 +1049,7 @@ app = FastAPI(
     version="1.0.0",
     description="Flashscore (RapidAPI) -> Postgres (Neon) | Only finished matches (1X2 if available).",
 )
+app.router.route_class = _TracedRoute
 
 @app.on_event("startup")
 def _startup():
@@ -291,11 +1066,13 @@ def health():
         "time_tr": now_tr.isoformat(),
         "tz": "Europe/Istanbul",
         "db": {"connected": bool(engine), "url_set": bool(DATABASE_URL)},
+        "profiling": {"admin_token_set": bool(ADMIN_TOKEN), "slow_request_ms": SLOW_REQUEST_MS},
         "flashscore": {
             "base_url": FLASHSCORE_BASE_URL,
             "host": FLASHSCORE_RAPIDAPI_HOST,
             "rapidapi_key_set": bool(RAPIDAPI_KEY),
             "matches_path_template": FLASHSCORE_MATCHES_PATH_TEMPLATE,
+            "sport_markets": FLASHSCORE_SPORT_MARKETS,
         },
     }
 
@@ -357,27 +1134,43 @@ def flashscore_check_base():
         },
     }
 
+def _fs_matches_path(date: str, sport_id: int = DEFAULT_SPORT_ID) -> str:
+    return FLASHSCORE_MATCHES_PATH_TEMPLATE.format(sport=sport_id, date=date)
+
 @app.get("/flashscore/matches/{date}", tags=["Flashscore"])
-def flashscore_matches(date: str):
+def flashscore_matches(
+    date: str,
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1, description="Flashscore sport id (1=futbol)"),
+):
     """
     Raw matches of a date from Flashscore (RapidAPI).
-    Default endpoint guess: football/matches/{date}
+    Default endpoint: match/list/{sport}/{date}
     You can override with FLASHSCORE_MATCHES_PATH_TEMPLATE env.
     """
-    path = FLASHSCORE_MATCHES_PATH_TEMPLATE.format(date=date)
-    return flashscore_get(path)
-
-@app.post("/flashscore/db/finished-ms/sync-date", tags=["Flashscore DB"])
-def flashscore_db_finished_ms_sync_date(
-    date: str = Query(..., description="YYYY-MM-DD"),
-    limit_write: int = Query(0, ge=0, le=5000, description="0=limitsiz"),
-    sample: int = Query(0, ge=0, le=50, description="debug örnek (0=kapalı)"),
-):
+    return flashscore_get(_fs_matches_path(date, sport_id))
+
+def flash_sync_date(
+    date: str,
+    *,
+    sport_id: int = DEFAULT_SPORT_ID,
+    limit_write: int = 0,
+    sample: int = 0,
+    payload: Any = None,
+    fetched_at_tr: Optional[str] = None,
+    overwrite: bool = False,
+) -> dict:
     """
+    Tek bir (sport, date) shard'ını Flashscore'dan çekip flash_finished_ms'e yazar.
+    Hem sync-date endpoint'i hem de kuyruk worker'ları bunu kullanır.
+    payload verilirse (arşiv replay) network'e çıkılmaz.
+
     KURAL:
       - FT skoru varsa maç bitmiştir.
-      - FT skor + MS(1X2) odds varsa DB'ye yazılır.
-      - Aynı flash_match_id varsa INSERT yapılmaz.
+      - FT skor + MS(1X2) odds varsa DB'ye yazılır
+        (iki yollu "12" market sporlarında 1 ve 2 yeterli, bkz. FLASHSCORE_SPORT_MARKETS).
+      - Aynı flash_match_id (hangi partition'da olursa olsun, flash_match_ids lookup'ı) varsa
+        INSERT yapılmaz. overwrite=True ise parse edilen alanlar güncellenir; TR tarihi değiştiyse
+        satır yeni güne (partition'a) taşınır.
     """
 
     ensure_schema()
@@ -391,18 +1184,28 @@ def flashscore_db_finished_ms_sync_date(
     if engine is None:
         raise HTTPException(status_code=500, detail="DATABASE_URL/engine yok")
 
-    fetched_at_tr = datetime.now(TR_TZ).isoformat()
+    market = _sport_market(sport_id)
+
+    fetched_at_tr = fetched_at_tr or datetime.now(TR_TZ).isoformat()
 
-    data = flashscore_get(f"match/list/1/{date}")
+    data = payload if payload is not None else flashscore_get(_fs_matches_path(date, sport_id))
     blocks = data if isinstance(data, list) else (data.get("data") or data.get("items") or [])
     if not isinstance(blocks, list):
         blocks = []
 
+    # yazılacak ayların partition'ları (TR'ye çevrilen tarih komşu aya taşabilir)
+    with span("partitions.ensure"):
+        ensure_finished_ms_partitions(_fs_payload_days(blocks) | {datetime.strptime(date, "%Y-%m-%d").date()})
+
     # --- counters ---
     api_total = 0
     finished_detected = 0
     eligible_for_db = 0
     inserted_new = 0
+    updated_existing = 0
+    unchanged_existing = 0
+    rated_changed = 0
+    new_teams = set()
 
     skipped = {
         "missing_id_ts": 0,
@@ -426,28 +1229,85 @@ def flashscore_db_finished_ms_sync_date(
             }
         )
 
-    sql_insert = text("""
+    on_conflict_sql = "DO NOTHING"
+    if overwrite:
+        on_conflict_sql = """DO UPDATE SET
+            sport_id = EXCLUDED.sport_id,
+            match_datetime_tr = EXCLUDED.match_datetime_tr,
+            date = EXCLUDED.date,
+            time = EXCLUDED.time,
+            fetched_at_tr = EXCLUDED.fetched_at_tr,
+            country_name = EXCLUDED.country_name,
+            tournament_name = EXCLUDED.tournament_name,
+            home = EXCLUDED.home,
+            away = EXCLUDED.away,
+            ft_home = EXCLUDED.ft_home,
+            ft_away = EXCLUDED.ft_away,
+            ms1 = EXCLUDED.ms1,
+            ms0 = EXCLUDED.ms0,
+            ms2 = EXCLUDED.ms2,
+            raw_json = EXCLUDED.raw_json,
+            updated_at = NOW()
+        -- değişmeyen satıra dokunma: replay yeni tuple / updated_at üretmesin (BRIN sırası bozulmasın)
+        WHERE (
+            flash_finished_ms.sport_id, flash_finished_ms.match_datetime_tr,
+            flash_finished_ms.country_name, flash_finished_ms.tournament_name,
+            flash_finished_ms.home, flash_finished_ms.away,
+            flash_finished_ms.ft_home, flash_finished_ms.ft_away,
+            flash_finished_ms.ms1, flash_finished_ms.ms0, flash_finished_ms.ms2
+        ) IS DISTINCT FROM (
+            EXCLUDED.sport_id, EXCLUDED.match_datetime_tr,
+            EXCLUDED.country_name, EXCLUDED.tournament_name,
+            EXCLUDED.home, EXCLUDED.away,
+            EXCLUDED.ft_home, EXCLUDED.ft_away,
+            EXCLUDED.ms1, EXCLUDED.ms0, EXCLUDED.ms2
+        )"""
+
+    sql_insert = text(f"""
         INSERT INTO flash_finished_ms (
-            flash_match_id, match_datetime_tr, date, time,
+            flash_match_id, sport_id, match_date, match_datetime_tr, date, time,
             fetched_at_tr, country_name, tournament_name,
             home, away, ft_home, ft_away,
             ms1, ms0, ms2,
-            raw_json, updated_at
+            raw_json, rated_at, updated_at
         )
         VALUES (
-            :flash_match_id, :match_datetime_tr, :date, :time,
+            :flash_match_id, :sport_id, :match_date, :match_datetime_tr, :date, :time,
             :fetched_at_tr, :country_name, :tournament_name,
             :home, :away, :ft_home, :ft_away,
             :ms1, :ms0, :ms2,
-            :raw_json, NOW()
+            :raw_json, :rated_at, NOW()
         )
+        ON CONFLICT (flash_match_id, match_date) {on_conflict_sql}
+        RETURNING (xmax = 0) AS inserted, rated_at
+    """)
+
+    # global tekillik: yeni id ise lookup'a yazılır (satır döner), varsa mevcut gün okunur
+    sql_claim_id = text("""
+        INSERT INTO flash_match_ids (flash_match_id, match_date)
+        VALUES (:flash_match_id, :match_date)
         ON CONFLICT (flash_match_id) DO NOTHING
+        RETURNING match_date
+    """)
+    sql_existing_date = text("""
+        SELECT match_date FROM flash_match_ids WHERE flash_match_id = :flash_match_id FOR UPDATE
+    """)
+
+    # overwrite: düzeltilmiş parse maçı başka güne taşıyorsa eski satırı kaldır
+    # (match_date verildiği için sadece eski partition'a bakılır)
+    sql_delete_moved = text("""
+        DELETE FROM flash_finished_ms
+        WHERE flash_match_id = :flash_match_id AND match_date = :old_date
+        RETURNING rated_at
+    """)
+    sql_move_id = text("""
+        UPDATE flash_match_ids SET match_date = :match_date WHERE flash_match_id = :flash_match_id
     """)
 
     with engine.begin() as conn:
         db_count_before = conn.execute(
-            text("SELECT COUNT(*)::int FROM flash_finished_ms WHERE date = :d"),
-            {"d": date},
+            text("SELECT COUNT(*)::int FROM flash_finished_ms WHERE match_date = CAST(:d AS DATE) AND sport_id = :s"),
+            {"d": date, "s": sport_id},
         ).scalar() or 0
 
         for blk in blocks:
@@ -487,7 +1347,7 @@ def flashscore_db_finished_ms_sync_date(
                 ms0 = _safe_float(odds.get("X"))
                 ms2 = _safe_float(odds.get("2"))
 
-                if ms1 is None or ms0 is None or ms2 is None:
+                if ms1 is None or ms2 is None or (market == "1x2" and ms0 is None):
                     skipped["no_ms_odds"] += 1
                     _push("no_ms_odds", m)
                     continue
@@ -498,15 +1358,33 @@ def flashscore_db_finished_ms_sync_date(
                     continue
 
                 # ✅ UTC → TR dönüşümü (kritik fix)
-                dt_tr = datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(TR_TZ)
+                with span("tz.convert"):
+                    dt_tr = datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(TR_TZ)
 
                 country_name = (m.get("country") or {}).get("name") or blk.get("country_name")
                 tournament_name = (m.get("tournament") or {}).get("name") or blk.get("name")
 
+                id_params = {"flash_match_id": match_id, "match_date": dt_tr.date()}
+                is_new = conn.execute(sql_claim_id, id_params).first() is not None
+
+                moved = None
+                if not is_new:
+                    if not overwrite:
+                        continue
+                    old_date = conn.execute(sql_existing_date, id_params).scalar()
+                    if old_date is not None and old_date != dt_tr.date():
+                        moved = conn.execute(
+                            sql_delete_moved,
+                            {"flash_match_id": match_id, "old_date": old_date},
+                        ).first()
+                        conn.execute(sql_move_id, id_params)
+
                 res = conn.execute(
                     sql_insert,
                     {
                         "flash_match_id": match_id,
+                        "sport_id": sport_id,
+                        "match_date": dt_tr.date(),
                         "match_datetime_tr": dt_tr.isoformat(),
                         "date": dt_tr.date().isoformat(),
                         "time": dt_tr.time().strftime("%H:%M:%S"),
@@ -521,21 +1399,35 @@ def flashscore_db_finished_ms_sync_date(
                         "ms0": ms0,
                         "ms2": ms2,
                         "raw_json": json.dumps(m, ensure_ascii=False),
+                        # taşınan satır rating'e zaten işlendiyse tekrar işlenmesin
+                        "rated_at": moved.rated_at if moved is not None else None,
                     },
                 )
 
-                if getattr(res, "rowcount", 0) == 1:
+                row = res.first()
+                if row is None:
+                    unchanged_existing += 1
+                    continue
+                if row.inserted and is_new:
                     inserted_new += 1
+                else:
+                    updated_existing += 1
+                    # rating'e işlenmiş bir maç değişti -> state artık eski
+                    if row.rated_at is not None:
+                        rated_changed += 1
+                new_teams.update(t for t in (ht.get("name"), at.get("name")) if t)
 
         db_count_after = conn.execute(
-            text("SELECT COUNT(*)::int FROM flash_finished_ms WHERE date = :d"),
-            {"d": date},
+            text("SELECT COUNT(*)::int FROM flash_finished_ms WHERE match_date = CAST(:d AS DATE) AND sport_id = :s"),
+            {"d": date, "s": sport_id},
         ).scalar() or 0
 
     # --- sade response ---
     resp = {
         "ok": True,
         "date": date,
+        "sport_id": sport_id,
+        "market": market,
         "api_total": api_total,
         "finished_detected": finished_detected,
         "eligible_for_db": eligible_for_db,
@@ -546,26 +1438,84 @@ def flashscore_db_finished_ms_sync_date(
         "fetched_at_tr": fetched_at_tr,
     }
 
+    if overwrite:
+        resp["updated_existing"] = updated_existing
+        resp["unchanged_existing"] = unchanged_existing
+
+    # incremental update işlenmiş maçları tekrar uygulamaz: checkpoint'e rebuild gerekli yazılır
+    if rated_changed:
+        resp["rated_changed"] = rated_changed
+        try:
+            with engine.begin() as conn:
+                resp["rebuild_required"] = _ratings_checkpoint(conn, 0, None, rebuild_required=True)
+        except Exception as e:
+            resp["rebuild_required"] = {"ok": False, "error": repr(e)}
+
+    # feature store commit'ten sonra, ayrı transaction'da güncellenir:
+    # böylece paralel worker'ların commit'lenmiş maçları da okunur
+    if new_teams:
+        try:
+            with span("features.refresh"):
+                resp["features_refreshed"] = refresh_team_features(sport_id=sport_id, teams=new_teams)
+        except Exception as e:
+            resp["features_refreshed"] = {"ok": False, "error": repr(e)}
+    else:
+        resp["features_refreshed"] = 0
+
+    # yeni sonuçları rating engine'e işle (başka bir process çalıştırıyorsa sonraki tura kalır)
+    if inserted_new:
+        try:
+            with span("ratings.update"):
+                resp["ratings"] = ratings_update_incremental(wait=False)
+        except Exception as e:
+            resp["ratings"] = {"ok": False, "error": repr(e)}
+
     if sample > 0:
         resp["examples"] = examples
 
     return resp
 
+@app.post("/flashscore/db/finished-ms/sync-date", tags=["Flashscore DB"])
+def flashscore_db_finished_ms_sync_date(
+    date: str = Query(..., description="YYYY-MM-DD"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1, description="Flashscore sport id (1=futbol)"),
+    limit_write: int = Query(0, ge=0, le=5000, description="0=limitsiz"),
+    sample: int = Query(0, ge=0, le=50, description="debug örnek (0=kapalı)"),
+):
+    return flash_sync_date(date, sport_id=sport_id, limit_write=limit_write, sample=sample)
+
 @app.get("/flashscore/db/finished-ms", tags=["Flashscore DB"])
 def flashscore_db_finished_ms(
     date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD (dahil)"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (dahil)"),
     country: Optional[str] = Query(None, description="Örn: Brazil"),
     tournament: Optional[str] = Query(None, description="Örn: BRAZIL: Copinha"),
+    ms1_min: Optional[float] = Query(None, gt=1.0),
+    ms1_max: Optional[float] = Query(None, gt=1.0),
+    ms0_min: Optional[float] = Query(None, gt=1.0),
+    ms0_max: Optional[float] = Query(None, gt=1.0),
+    ms2_min: Optional[float] = Query(None, gt=1.0),
+    ms2_max: Optional[float] = Query(None, gt=1.0),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1, description="Flashscore sport id (1=futbol)"),
     limit: int = Query(500, ge=1, le=5000),
 ):
     ensure_schema()
 
-    where = []
-    params: Dict[str, Any] = {"limit": limit}
+    # sport_id eşitliği (sport_id, msX_bucket, ...) index'lerinin öncü kolonu
+    where = ["sport_id = :sport_id"]
+    params: Dict[str, Any] = {"sport_id": sport_id, "limit": limit}
 
+    # match_date (partition key) üzerinden filtre: sadece ilgili aylık partition'lar taranır
     if date:
-        where.append("date = :date")
-        params["date"] = date
+        where.append("match_date = :date")
+        params["date"] = _parse_ymd(date, "date")
+    if date_from:
+        where.append("match_date >= :date_from")
+        params["date_from"] = _parse_ymd(date_from, "date_from")
+    if date_to:
+        where.append("match_date <= :date_to")
+        params["date_to"] = _parse_ymd(date_to, "date_to")
     if country:
         where.append("country_name ILIKE :country")
         params["country"] = f"%{country}%"
@@ -573,10 +1523,24 @@ def flashscore_db_finished_ms(
         where.append("tournament_name ILIKE :tournament")
         params["tournament"] = f"%{tournament}%"
 
-    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    # oran aralığı: (sport_id, bucket) index'i ile daralt, kesin sınırı kolonla uygula
+    odds_ranges = {"ms1": (ms1_min, ms1_max), "ms0": (ms0_min, ms0_max), "ms2": (ms2_min, ms2_max)}
+    for market, (lo, hi) in odds_ranges.items():
+        odds_col, bucket_col, _, _ = ODDS_MARKETS[market]
+        if lo is not None:
+            where.append(f"{bucket_col} >= :{market}_bucket_min AND {odds_col} >= :{market}_min")
+            params[f"{market}_bucket_min"] = _odds_bucket_floor(lo)
+            params[f"{market}_min"] = lo
+        if hi is not None:
+            where.append(f"{bucket_col} <= :{market}_bucket_max AND {odds_col} <= :{market}_max")
+            params[f"{market}_bucket_max"] = _odds_bucket_floor(hi)
+            params[f"{market}_max"] = hi
+
+    where_sql = "WHERE " + " AND ".join(where)
     sql = text(f"""
         SELECT
             flash_match_id,
+            sport_id,
             match_datetime_tr,
             date, time,
             country_name,
@@ -584,11 +1548,12 @@ def flashscore_db_finished_ms(
             home, away,
             ft_home, ft_away,
             ms1, ms0, ms2,
+            p1, p0, p2, ms_overround,
             fetched_at_tr,
             updated_at
         FROM flash_finished_ms
         {where_sql}
-        ORDER BY date DESC, time DESC
+        ORDER BY match_date DESC, time DESC
         LIMIT :limit
     """)
 
@@ -602,24 +1567,40 @@ def flashscore_db_finished_ms(
     }
 
 @app.get("/flashscore/db/finished-ms/daily-counts", tags=["Flashscore DB"])
-def flashscore_db_finished_ms_daily_counts():
+def flashscore_db_finished_ms_daily_counts(
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD (dahil)"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (dahil)"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1, description="Flashscore sport id (1=futbol)"),
+):
     if engine is None:
         raise HTTPException(status_code=500, detail="DATABASE_URL/engine yok")
 
-    sql = text("""
+    where = ["sport_id = :sport_id"]
+    params: Dict[str, Any] = {"sport_id": sport_id}
+    if date_from:
+        where.append("match_date >= :date_from")
+        params["date_from"] = _parse_ymd(date_from, "date_from")
+    if date_to:
+        where.append("match_date <= :date_to")
+        params["date_to"] = _parse_ymd(date_to, "date_to")
+
+    where_sql = "WHERE " + " AND ".join(where)
+    sql = text(f"""
         SELECT
-            date,
+            CAST(match_date AS TEXT) AS date,
             COUNT(*) AS match_count
         FROM flash_finished_ms
-        GROUP BY date
-        ORDER BY date
+        {where_sql}
+        GROUP BY match_date
+        ORDER BY match_date
     """)
 
     with engine.begin() as conn:
-        rows = conn.execute(sql).fetchall()
+        rows = conn.execute(sql, params).fetchall()
 
     return {
         "ok": True,
+        "sport_id": sport_id,
         "items": [
             {"date": r.date, "count": r.match_count}
             for r in rows
@@ -629,7 +1610,8 @@ def flashscore_db_finished_ms_daily_counts():
 @app.get("/flashscore/db/finished-ms/by-tournament", tags=["Flashscore DB"])
 def flashscore_db_finished_ms_by_tournament(
     limit: int = Query(200, ge=1, le=2000),
-    include_country: int = Query(1, ge=0, le=1, description="1=country+tournament, 0=sadece tournament")
+    include_country: int = Query(1, ge=0, le=1, description="1=country+tournament, 0=sadece tournament"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1, description="Flashscore sport id (1=futbol)"),
 ):
     ensure_schema()
     if engine is None:
@@ -642,6 +1624,7 @@ def flashscore_db_finished_ms_by_tournament(
                 COALESCE(tournament_name, '') AS tournament_name,
                 COUNT(*)::int AS match_count
             FROM flash_finished_ms
+            WHERE sport_id = :sport_id
             GROUP BY 1, 2
             ORDER BY match_count DESC
             LIMIT :limit
@@ -652,13 +1635,14 @@ def flashscore_db_finished_ms_by_tournament(
                 COALESCE(tournament_name, '') AS tournament_name,
                 COUNT(*)::int AS match_count
             FROM flash_finished_ms
+            WHERE sport_id = :sport_id
             GROUP BY 1
             ORDER BY match_count DESC
             LIMIT :limit
         """)
 
     with engine.begin() as conn:
-        rows = conn.execute(sql, {"limit": limit}).mappings().all()
+        rows = conn.execute(sql, {"limit": limit, "sport_id": sport_id}).mappings().all()
 
     # JSON formatını temiz döndürelim
     if include_country == 1:
@@ -679,6 +1663,1533 @@ def flashscore_db_finished_ms_by_tournament(
             for r in rows
         ]
 
+    return {"ok": True, "sport_id": sport_id, "count": len(items), "items": items}
+
+
+@app.get("/flashscore/db/finished-ms/odds-buckets", tags=["Flashscore DB"])
+def flashscore_db_finished_ms_odds_buckets(
+    market: str = Query("ms1", description="ms1 | ms0 | ms2"),
+    odds_min: Optional[float] = Query(None, gt=1.0, description="örn: 1.80"),
+    odds_max: Optional[float] = Query(None, gt=1.0, description="örn: 1.90"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1),
+    min_samples: int = Query(1, ge=1, description="bu sayının altındaki bucket'lar dönmez"),
+):
+    """
+    Seçilen market'in oran bucket'ları için sonuç frekansları ve ortalama implied olasılık.
+    (sport_id, bucket, result_1x2) INCLUDE (p1, p0, p2) index'inden okunur (kalibrasyon analizi).
+
+    Sınırlar bucket hassasiyetindedir: [odds_min'in bucket'ı, odds_max'ın üst kenarı).
+    Örn: odds_min=1.80&odds_max=1.90 => sadece 1.80-1.89 bucket'ı.
+    """
+    ensure_schema()
+
+    if market not in ODDS_MARKETS:
+        raise HTTPException(status_code=400, detail=f"market {sorted(ODDS_MARKETS)} içinden olmalı")
+    if _sport_market(sport_id) != "1x2":
+        raise HTTPException(status_code=400, detail=f"sport_id={sport_id} 1x2 market değil; implied olasılık yok")
+    _, bucket_col, prob_col, win_result = ODDS_MARKETS[market]
+
+    where = ["sport_id = :sport_id", f"{bucket_col} IS NOT NULL", "result_1x2 IS NOT NULL"]
+    params: Dict[str, Any] = {"sport_id": sport_id, "min_samples": min_samples}
+    if odds_min is not None:
+        where.append(f"{bucket_col} >= :bucket_min")
+        params["bucket_min"] = _odds_bucket_floor(odds_min)
+    if odds_max is not None:
+        # üst sınır hariç: 1.90 => bucket < 19
+        where.append(f"{bucket_col} < :bucket_max")
+        params["bucket_max"] = math.ceil(round(odds_max * ODDS_BUCKET_SCALE, 9))
+
+    sql = text(f"""
+        SELECT
+            {bucket_col} AS bucket,
+            COUNT(*)::int AS n,
+            COUNT(*) FILTER (WHERE result_1x2 = '1')::int AS n1,
+            COUNT(*) FILTER (WHERE result_1x2 = 'X')::int AS n0,
+            COUNT(*) FILTER (WHERE result_1x2 = '2')::int AS n2,
+            AVG(p1) AS avg_p1,
+            AVG(p0) AS avg_p0,
+            AVG(p2) AS avg_p2
+        FROM flash_finished_ms
+        WHERE {" AND ".join(where)}
+        GROUP BY {bucket_col}
+        HAVING COUNT(*) >= :min_samples
+        ORDER BY {bucket_col}
+    """)
+
+    with engine.begin() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    items = []
+    for r in rows:
+        n = r["n"]
+        freq = {"1": r["n1"] / n, "X": r["n0"] / n, "2": r["n2"] / n}
+        avg_prob = r[f"avg_{prob_col}"]
+        items.append({
+            "bucket": r["bucket"],
+            "odds_from": r["bucket"] / ODDS_BUCKET_SCALE,
+            "odds_to": (r["bucket"] + 1) / ODDS_BUCKET_SCALE,
+            "n": n,
+            "count_1": r["n1"],
+            "count_x": r["n0"],
+            "count_2": r["n2"],
+            "freq_1": freq["1"],
+            "freq_x": freq["X"],
+            "freq_2": freq["2"],
+            "avg_p1": r["avg_p1"],
+            "avg_p0": r["avg_p0"],
+            "avg_p2": r["avg_p2"],
+            # gerçekleşen frekans - ortalama implied olasılık (pozitif = oran "değerli")
+            "edge": (freq[win_result] - avg_prob) if avg_prob is not None else None,
+        })
+
+    return {
+        "ok": True,
+        "market": market,
+        "sport_id": sport_id,
+        "bucket_width": 1 / ODDS_BUCKET_SCALE,
+        "count": len(items),
+        "samples": sum(i["n"] for i in items),
+        "items": items,
+    }
+
+# ==========================================================
+# INGEST QUEUE  (flash_ingest_queue: sport + date shard'ları)
+# ==========================================================
+# Birden fazla worker process/node aynı kuyruğu FOR UPDATE SKIP LOCKED ile boşaltır:
+# her satırı tek bir worker alır, kilitli satırlar diğerleri tarafından atlanır.
+def _default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _parse_sport_ids(sports: str) -> list:
+    try:
+        ids = sorted({int(x) for x in sports.split(",") if x.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="sports virgülle ayrılmış sayılar olmalı (örn: 1,2)")
+    if not ids or any(i < 1 for i in ids):
+        raise HTTPException(status_code=400, detail="sports boş / geçersiz")
+    return ids
+
+def ingest_enqueue(
+    sport_ids: list,
+    date_from: str,
+    date_to: str,
+    *,
+    priority: int = 0,
+    requeue: bool = False,
+) -> dict:
+    """
+    [date_from, date_to] aralığındaki her gün x her sport için bir iş ekler.
+    requeue=True ise mevcut (done/dead dahil) işler tekrar pending'e çekilir.
+    """
+    ensure_schema()
+
+    # maç sonucu marketi olmayan sporlar 0 satırla 'done' olmasın
+    for sid in sport_ids:
+        _sport_market(sid)
+
+    d_from = _parse_ymd(date_from, "date_from")
+    d_to = _parse_ymd(date_to, "date_to")
+    if d_to < d_from:
+        raise HTTPException(status_code=400, detail="date_to >= date_from olmalı")
+    n_days = (d_to - d_from).days + 1
+    if n_days > 3660:
+        raise HTTPException(status_code=400, detail="en fazla 3660 gün kuyruğa eklenebilir")
+
+    conflict_sql = "DO NOTHING"
+    if requeue:
+        conflict_sql = """
+            DO UPDATE SET
+                status = 'pending',
+                priority = EXCLUDED.priority,
+                attempts = 0,
+                max_attempts = EXCLUDED.max_attempts,
+                locked_by = NULL,
+                locked_at = NULL,
+                next_run_at = NOW(),
+                last_error = NULL,
+                updated_at = NOW()
+            WHERE flash_ingest_queue.status <> 'running'
+        """
+
+    # sport x gün kartezyeni tek statement'ta (binlerce tek satırlık INSERT yerine)
+    sql = text(f"""
+        INSERT INTO flash_ingest_queue (sport_id, date, priority, max_attempts)
+        SELECT s.sport_id, to_char(d, 'YYYY-MM-DD'), :priority, :max_attempts
+        FROM unnest(CAST(:sport_ids AS INT[])) AS s(sport_id)
+        CROSS JOIN generate_series(CAST(:date_from AS DATE), CAST(:date_to AS DATE), interval '1 day') AS d
+        ORDER BY 2, 1
+        ON CONFLICT (sport_id, date) {conflict_sql}
+    """)
+
+    with engine.begin() as conn:
+        res = conn.execute(
+            sql,
+            {
+                "sport_ids": sport_ids,
+                "date_from": d_from,
+                "date_to": d_to,
+                "priority": priority,
+                "max_attempts": INGEST_MAX_ATTEMPTS,
+            },
+        )
+        affected = getattr(res, "rowcount", 0) or 0
+
+    return {
+        "ok": True,
+        "sport_ids": sport_ids,
+        "date_from": d_from.isoformat(),
+        "date_to": d_to.isoformat(),
+        "shards": len(sport_ids) * n_days,
+        "enqueued": affected,
+        "requeue": requeue,
+    }
+
+def ingest_claim(worker_id: str) -> Optional[dict]:
+    """
+    Sıradaki uygun işi atomik olarak alır (yoksa None).
+    Süresi dolmuş 'running' kilitleri (çöken worker) tekrar alınabilir.
+    """
+    ensure_schema()
+
+    with engine.begin() as conn:
+        # deneme hakkı bitmiş + kilidi düşmüş işler -> dead
+        conn.execute(
+            text("""
+                UPDATE flash_ingest_queue
+                SET status = 'dead',
+                    last_error = COALESCE(last_error, 'lock expired'),
+                    locked_by = NULL,
+                    updated_at = NOW()
+                WHERE status = 'running'
+                  AND locked_at < NOW() - make_interval(secs => :lock_timeout)
+                  AND attempts >= max_attempts
+            """),
+            {"lock_timeout": INGEST_LOCK_TIMEOUT_SEC},
+        )
+
+        row = conn.execute(
+            text("""
+                UPDATE flash_ingest_queue q
+                SET status = 'running',
+                    attempts = q.attempts + 1,
+                    locked_by = :worker_id,
+                    locked_at = NOW(),
+                    updated_at = NOW()
+                WHERE q.id = (
+                    SELECT id
+                    FROM flash_ingest_queue
+                    WHERE attempts < max_attempts
+                      AND (
+                            (status IN ('pending', 'failed') AND next_run_at <= NOW())
+                         OR (status = 'running'
+                             AND locked_at < NOW() - make_interval(secs => :lock_timeout))
+                      )
+                    ORDER BY priority DESC, date, sport_id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING q.id, q.sport_id, q.date, q.attempts, q.max_attempts
+            """),
+            {"worker_id": worker_id, "lock_timeout": INGEST_LOCK_TIMEOUT_SEC},
+        ).mappings().first()
+
+    return dict(row) if row else None
+
+def ingest_complete(item: dict, worker_id: str, stats: dict, duration_ms: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                UPDATE flash_ingest_queue
+                SET status = 'done',
+                    stats_json = :stats_json,
+                    duration_ms = :duration_ms,
+                    last_error = NULL,
+                    locked_by = NULL,
+                    finished_at = NOW(),
+                    updated_at = NOW()
+                WHERE id = :id AND locked_by = :worker_id
+            """),
+            {
+                "id": item["id"],
+                "worker_id": worker_id,
+                "stats_json": _dump_json(stats),
+                "duration_ms": duration_ms,
+            },
+        )
+
+def ingest_fail(item: dict, worker_id: str, error: str, duration_ms: int) -> str:
+    """
+    Hata kaydeder; deneme hakkı kaldıysa üstel backoff ile 'failed', yoksa 'dead'.
+    """
+    attempts = int(item.get("attempts") or 1)
+    dead = attempts >= int(item.get("max_attempts") or INGEST_MAX_ATTEMPTS)
+    status = "dead" if dead else "failed"
+    backoff = INGEST_RETRY_BACKOFF_SEC * (2 ** max(0, attempts - 1))
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                UPDATE flash_ingest_queue
+                SET status = :status,
+                    last_error = :error,
+                    duration_ms = :duration_ms,
+                    locked_by = NULL,
+                    next_run_at = NOW() + make_interval(secs => :backoff),
+                    updated_at = NOW()
+                WHERE id = :id AND locked_by = :worker_id
+            """),
+            {
+                "id": item["id"],
+                "worker_id": worker_id,
+                "status": status,
+                "error": error[:2000],
+                "duration_ms": duration_ms,
+                "backoff": backoff,
+            },
+        )
+    return status
+
+class _LockHeartbeat(threading.Thread):
+    """
+    İş sürerken locked_at'i periyodik tazeler: INGEST_LOCK_TIMEOUT_SEC'ten uzun süren canlı bir
+    shard başka worker tarafından tekrar alınmasın. Process ölürse tazeleme durur, kilit düşer.
+    """
+
+    def __init__(self, item_id: int, worker_id: str):
+        super().__init__(name=f"ingest-heartbeat-{item_id}", daemon=True)
+        self.item_id = item_id
+        self.worker_id = worker_id
+        self.interval = max(1.0, INGEST_LOCK_TIMEOUT_SEC / 3.0)
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("""
+                            UPDATE flash_ingest_queue
+                            SET locked_at = NOW()
+                            WHERE id = :id AND locked_by = :worker_id AND status = 'running'
+                        """),
+                        {"id": self.item_id, "worker_id": self.worker_id},
+                    )
+            except Exception as e:
+                logger.warning("ingest heartbeat: item=%s %r", self.item_id, e)
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+def ingest_process(item: dict, worker_id: str) -> dict:
+    heartbeat = _LockHeartbeat(item["id"], worker_id)
+    heartbeat.start()
+    try:
+        return _ingest_process(item, worker_id)
+    finally:
+        heartbeat.stop()
+
+def _ingest_process(item: dict, worker_id: str) -> dict:
+    t0 = time.perf_counter()
+    try:
+        stats = flash_sync_date(item["date"], sport_id=int(item["sport_id"]))
+    except Exception as e:
+        duration_ms = int((time.perf_counter() - t0) * 1000)
+        err = getattr(e, "detail", None) or repr(e)
+        status = ingest_fail(item, worker_id, err if isinstance(err, str) else _dump_json(err), duration_ms)
+        return {"id": item["id"], "sport_id": item["sport_id"], "date": item["date"], "status": status}
+
+    duration_ms = int((time.perf_counter() - t0) * 1000)
+    ingest_complete(item, worker_id, stats, duration_ms)
+    return {
+        "id": item["id"],
+        "sport_id": item["sport_id"],
+        "date": item["date"],
+        "status": "done",
+        "inserted_new": stats.get("inserted_new"),
+        "duration_ms": duration_ms,
+    }
+
+def ingest_work(worker_id: Optional[str] = None, max_items: int = 0) -> dict:
+    """
+    Kuyruk boşalana (veya max_items dolana) kadar iş alıp işler.
+    """
+    worker_id = worker_id or _default_worker_id()
+    processed = []
+    while not max_items or len(processed) < max_items:
+        item = ingest_claim(worker_id)
+        if item is None:
+            break
+        try:
+            processed.append(ingest_process(item, worker_id))
+        except Exception as e:
+            # complete/fail yazılamadı (örn. bağlantı koptu): iş 'running' kalır, kilit süresi dolunca tekrar alınır
+            logger.exception("ingest: item=%s sonuç yazılamadı", item["id"])
+            processed.append({
+                "id": item["id"],
+                "sport_id": item["sport_id"],
+                "date": item["date"],
+                "status": "error",
+                "error": repr(e),
+            })
+
+    return {
+        "ok": True,
+        "worker_id": worker_id,
+        "processed": len(processed),
+        "by_status": dict(Counter(p["status"] for p in processed)),
+        "items": processed,
+    }
+
+@app.post("/flashscore/queue/enqueue", tags=["Ingest Queue"])
+def flashscore_queue_enqueue(
+    date_from: str = Query(..., description="YYYY-MM-DD"),
+    date_to: str = Query(..., description="YYYY-MM-DD"),
+    sports: str = Query(str(DEFAULT_SPORT_ID), description="virgülle sport id listesi, örn: 1,2"),
+    priority: int = Query(0, description="büyük olan önce işlenir"),
+    requeue: int = Query(0, ge=0, le=1, description="1=mevcut işleri tekrar pending yap"),
+):
+    return ingest_enqueue(
+        _parse_sport_ids(sports),
+        date_from,
+        date_to,
+        priority=priority,
+        requeue=bool(requeue),
+    )
+
+@app.post("/flashscore/queue/work", tags=["Ingest Queue"])
+def flashscore_queue_work(
+    max_items: int = Query(10, ge=1, le=500),
+    worker_id: Optional[str] = Query(None),
+):
+    """
+    API process'i içinde sınırlı sayıda iş işler.
+    Büyük backfill'ler için apps/api/worker.py ile ayrı process'ler çalıştırın.
+    """
+    return ingest_work(worker_id=worker_id, max_items=max_items)
+
+@app.get("/flashscore/queue/status", tags=["Ingest Queue"])
+def flashscore_queue_status():
+    ensure_schema()
+
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT
+                sport_id,
+                status,
+                COUNT(*)::int AS shard_count,
+                MIN(date) AS date_min,
+                MAX(date) AS date_max,
+                COALESCE(SUM(duration_ms), 0)::bigint AS duration_ms_total
+            FROM flash_ingest_queue
+            GROUP BY sport_id, status
+            ORDER BY sport_id, status
+        """)).mappings().all()
+
+        workers = conn.execute(text("""
+            SELECT locked_by AS worker_id, COUNT(*)::int AS running, MIN(locked_at) AS oldest_lock
+            FROM flash_ingest_queue
+            WHERE status = 'running'
+            GROUP BY locked_by
+            ORDER BY locked_by
+        """)).mappings().all()
+
+    return {
+        "ok": True,
+        "items": [dict(r) for r in rows],
+        "workers": [dict(w) for w in workers],
+    }
+
+@app.get("/flashscore/queue/items", tags=["Ingest Queue"])
+def flashscore_queue_items(
+    status: Optional[str] = Query(None, description="pending | running | done | failed | dead"),
+    sport_id: Optional[int] = Query(None, ge=1),
+    limit: int = Query(200, ge=1, le=5000),
+):
+    ensure_schema()
+
+    where = []
+    params: Dict[str, Any] = {"limit": limit}
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    if sport_id is not None:
+        where.append("sport_id = :sport_id")
+        params["sport_id"] = sport_id
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    sql = text(f"""
+        SELECT
+            id, sport_id, date, status, priority,
+            attempts, max_attempts, locked_by, locked_at, next_run_at,
+            last_error, stats_json, duration_ms,
+            created_at, updated_at, finished_at
+        FROM flash_ingest_queue
+        {where_sql}
+        ORDER BY date DESC, sport_id
+        LIMIT :limit
+    """)
+
+    with engine.begin() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    items = []
+    for r in rows:
+        d = dict(r)
+        stats_json = d.pop("stats_json", None)
+        d["stats"] = json.loads(stats_json) if stats_json else None
+        items.append(d)
+
+    return {"ok": True, "count": len(items), "items": items}
+
+# ==========================================================
+# TEAM FEATURES  (flash_team_features)
+# ==========================================================
+# Her takım için tek satır: toplamlar, iç/dış saha ayrımı, ortalama kapanış oranları
+# ve son N maç formu. sync-date yeni maç yazdıkça sadece etkilenen takımlar
+# yeniden hesaplanır; okuma tarafı (sport_id, team) PK üzerinden tek lookup yapar.
+# Kilitler: incremental refresh takım başına (2701, hashtext) kilidi + 2701 shared kilit alır,
+# böylece sadece aynı takımı yazan shard'lar bekleşir; rebuild 2701'i exclusive alır.
+# Upsert (sport_id, team) sırasında yapılır (deadlock olmasın).
+_FEATURES_LOCK_KEY = 2701
+
+_TEAM_FEATURE_COLUMNS = [
+    "played", "wins", "draws", "losses", "goals_for", "goals_against",
+    "home_played", "home_wins", "home_draws", "home_losses", "home_goals_for", "home_goals_against",
+    "away_played", "away_wins", "away_draws", "away_losses", "away_goals_for", "away_goals_against",
+    "avg_odds_win", "avg_odds_draw", "avg_odds_loss", "home_avg_odds_win", "away_avg_odds_win",
+    "form_n", "form", "last_n_played", "last_n_points", "last_n_goals_for", "last_n_goals_against",
+    "last_n_avg_odds_win", "last_match_datetime_tr",
+]
+
+def _team_features_select_sql(team_filter: str) -> str:
+    """
+    flash_finished_ms -> takım başına feature satırı.
+    team_filter: home/away kolonuna uygulanacak ek koşul ("" = tüm takımlar).
+    """
+    home_filter = team_filter.format(col="home")
+    away_filter = team_filter.format(col="away")
+    return f"""
+        WITH tm AS (
+            SELECT sport_id, home AS team, TRUE AS is_home,
+                   ft_home AS gf, ft_away AS ga,
+                   ms1 AS odds_win, ms0 AS odds_draw, ms2 AS odds_loss,
+                   match_datetime_tr
+            FROM flash_finished_ms
+            WHERE home IS NOT NULL AND ft_home IS NOT NULL AND ft_away IS NOT NULL {home_filter}
+            UNION ALL
+            SELECT sport_id, away AS team, FALSE AS is_home,
+                   ft_away AS gf, ft_home AS ga,
+                   ms2 AS odds_win, ms0 AS odds_draw, ms1 AS odds_loss,
+                   match_datetime_tr
+            FROM flash_finished_ms
+            WHERE away IS NOT NULL AND ft_home IS NOT NULL AND ft_away IS NOT NULL {away_filter}
+        ),
+        ranked AS (
+            SELECT
+                tm.*,
+                CASE WHEN gf > ga THEN 'W' WHEN gf = ga THEN 'D' ELSE 'L' END AS res,
+                ROW_NUMBER() OVER (PARTITION BY sport_id, team ORDER BY match_datetime_tr DESC) AS rn
+            FROM tm
+        )
+        SELECT
+            sport_id,
+            team,
+
+            COUNT(*)::int AS played,
+            COUNT(*) FILTER (WHERE res = 'W')::int AS wins,
+            COUNT(*) FILTER (WHERE res = 'D')::int AS draws,
+            COUNT(*) FILTER (WHERE res = 'L')::int AS losses,
+            COALESCE(SUM(gf), 0)::int AS goals_for,
+            COALESCE(SUM(ga), 0)::int AS goals_against,
+
+            COUNT(*) FILTER (WHERE is_home)::int AS home_played,
+            COUNT(*) FILTER (WHERE is_home AND res = 'W')::int AS home_wins,
+            COUNT(*) FILTER (WHERE is_home AND res = 'D')::int AS home_draws,
+            COUNT(*) FILTER (WHERE is_home AND res = 'L')::int AS home_losses,
+            COALESCE(SUM(gf) FILTER (WHERE is_home), 0)::int AS home_goals_for,
+            COALESCE(SUM(ga) FILTER (WHERE is_home), 0)::int AS home_goals_against,
+
+            COUNT(*) FILTER (WHERE NOT is_home)::int AS away_played,
+            COUNT(*) FILTER (WHERE NOT is_home AND res = 'W')::int AS away_wins,
+            COUNT(*) FILTER (WHERE NOT is_home AND res = 'D')::int AS away_draws,
+            COUNT(*) FILTER (WHERE NOT is_home AND res = 'L')::int AS away_losses,
+            COALESCE(SUM(gf) FILTER (WHERE NOT is_home), 0)::int AS away_goals_for,
+            COALESCE(SUM(ga) FILTER (WHERE NOT is_home), 0)::int AS away_goals_against,
+
+            AVG(odds_win) AS avg_odds_win,
+            AVG(odds_draw) AS avg_odds_draw,
+            AVG(odds_loss) AS avg_odds_loss,
+            AVG(odds_win) FILTER (WHERE is_home) AS home_avg_odds_win,
+            AVG(odds_win) FILTER (WHERE NOT is_home) AS away_avg_odds_win,
+
+            CAST(:form_n AS int) AS form_n,
+            string_agg(res, '' ORDER BY rn) FILTER (WHERE rn <= :form_n) AS form,
+            COUNT(*) FILTER (WHERE rn <= :form_n)::int AS last_n_played,
+            COALESCE(SUM(CASE res WHEN 'W' THEN 3 WHEN 'D' THEN 1 ELSE 0 END) FILTER (WHERE rn <= :form_n), 0)::int AS last_n_points,
+            COALESCE(SUM(gf) FILTER (WHERE rn <= :form_n), 0)::int AS last_n_goals_for,
+            COALESCE(SUM(ga) FILTER (WHERE rn <= :form_n), 0)::int AS last_n_goals_against,
+            AVG(odds_win) FILTER (WHERE rn <= :form_n) AS last_n_avg_odds_win,
+
+            MAX(match_datetime_tr) AS last_match_datetime_tr
+        FROM ranked
+        GROUP BY sport_id, team
+    """
+
+def _team_features_upsert_sql(team_filter: str) -> str:
+    cols = ", ".join(_TEAM_FEATURE_COLUMNS)
+    updates = ",\n            ".join(f"{c} = EXCLUDED.{c}" for c in _TEAM_FEATURE_COLUMNS)
+    return f"""
+        INSERT INTO flash_team_features (sport_id, team, {cols}, updated_at)
+        SELECT sport_id, team, {cols}, NOW()
+        FROM ({_team_features_select_sql(team_filter)}) f
+        ORDER BY sport_id, team
+        ON CONFLICT (sport_id, team) DO UPDATE SET
+            {updates},
+            updated_at = NOW()
+    """
+
+def refresh_team_features(*, sport_id: int, teams) -> int:
+    """
+    Verilen takımların feature satırlarını yeniden hesaplar (incremental güncelleme).
+    (sport_id, home) / (sport_id, away) index'leri sayesinde sadece bu takımların maçları okunur.
+
+    Maçları yazan transaction commit'lendikten sonra çağrılmalı. Aynı takımı güncelleyen
+    refresh'ler takım kilidiyle seri çalışır: her biri kendinden önce commit'lenen maçları görür.
+    """
+    teams = sorted({t for t in teams if t})
+    if not teams:
+        return 0
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock_shared(:k)"), {"k": _FEATURES_LOCK_KEY})
+        # kilitler hash sırasıyla alınır: hash çakışmalarında da sıra tüm process'lerde aynı
+        conn.execute(
+            text("""
+                SELECT pg_advisory_xact_lock(:k, h)
+                FROM (
+                    SELECT DISTINCT hashtext(CAST(:sport_id AS TEXT) || ':' || t) AS h
+                    FROM unnest(CAST(:teams AS TEXT[])) AS t
+                    ORDER BY h
+                ) x
+            """),
+            {"k": _FEATURES_LOCK_KEY, "sport_id": sport_id, "teams": teams},
+        ).all()
+        res = conn.execute(
+            text(_team_features_upsert_sql("AND sport_id = :sport_id AND {col} = ANY(:teams)")),
+            {"sport_id": sport_id, "teams": teams, "form_n": TEAM_FORM_LAST_N},
+        )
+    return getattr(res, "rowcount", 0) or 0
+
+def rebuild_team_features() -> dict:
+    """Tüm geçmişten feature store'u sıfırdan kurar (tek transaction)."""
+    ensure_schema()
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _FEATURES_LOCK_KEY})
+        conn.execute(text("DELETE FROM flash_team_features"))
+        res = conn.execute(text(_team_features_upsert_sql("")), {"form_n": TEAM_FORM_LAST_N})
+        teams = getattr(res, "rowcount", 0) or 0
+    return {
+        "ok": True,
+        "teams": teams,
+        "form_n": TEAM_FORM_LAST_N,
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+def get_team_features(conn, sport_id: int, teams: list) -> Dict[str, dict]:
+    rows = conn.execute(
+        text("""
+            SELECT *
+            FROM flash_team_features
+            WHERE sport_id = :sport_id AND team = ANY(:teams)
+        """),
+        {"sport_id": sport_id, "teams": teams},
+    ).mappings().all()
+    return {r["team"]: dict(r) for r in rows}
+
+@app.post("/features/rebuild", tags=["Features"])
+def features_rebuild():
+    return rebuild_team_features()
+
+@app.get("/features/team", tags=["Features"])
+def features_team(
+    team: str = Query(..., description="Takım adı (flash_finished_ms.home/away ile birebir)"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1),
+):
+    ensure_schema()
+    with engine.begin() as conn:
+        features = get_team_features(conn, sport_id, [team]).get(team)
+    if features is None:
+        raise HTTPException(status_code=404, detail=f"feature bulunamadı: {team}")
+    return {"ok": True, "item": features}
+
+@app.get("/features/match", tags=["Features"])
+def features_match(
+    home: str = Query(..., description="Ev sahibi takım"),
+    away: str = Query(..., description="Deplasman takımı"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1),
+):
+    """İki takımın feature'larını tek sorguda döner (tahmin / analiz girdisi)."""
+    ensure_schema()
+    with engine.begin() as conn:
+        features = get_team_features(conn, sport_id, [home, away])
+    return {
+        "ok": True,
+        "home": features.get(home),
+        "away": features.get(away),
+    }
+
+# ==========================================================
+# RATINGS  (Elo + Poisson attack/defence)
+# ==========================================================
+# State (team_ratings / tournament_rating_stats) aynı zamanda checkpoint'tir:
+# işlenen maçlar flash_finished_ms.rated_at ile işaretlenir, restart'ta sadece
+# rated_at IS NULL olan yeni sonuçlar uygulanır. Aynı anda tek güncelleme
+# çalışsın diye pg advisory lock kullanılır.
+RATING_ENGINE_NAME = "elo_poisson"
+_RATINGS_LOCK_KEY = 2801
+
+_POISSON_GOALS = np.arange(POISSON_MAX_GOALS + 1)
+_POISSON_LOG_FACT = np.array([math.lgamma(k + 1) for k in range(POISSON_MAX_GOALS + 1)])
+
+def _rating_params() -> dict:
+    return {
+        "elo_init": ELO_INIT,
+        "elo_k": ELO_K,
+        "elo_home_adv": ELO_HOME_ADV,
+        "poisson_team_decay": POISSON_TEAM_DECAY,
+        "poisson_league_decay": POISSON_LEAGUE_DECAY,
+        "poisson_prior_matches": POISSON_PRIOR_MATCHES,
+    }
+
+def _elo_goal_multiplier(goal_diff: int) -> float:
+    # World Football Elo: farklı galibiyetler daha fazla puan taşır
+    gd = abs(goal_diff)
+    if gd <= 1:
+        return 1.0
+    if gd == 2:
+        return 1.5
+    return (11.0 + gd) / 8.0
+
+def _elo_expected_home(elo_home: float, elo_away: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** ((elo_away - (elo_home + ELO_HOME_ADV)) / 400.0))
+
+def _max_dt(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    # match_datetime_tr ISO string (hep +03:00) -> string karşılaştırması kronolojik
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+class RatingState:
+    """
+    Bellekteki rating state'i.
+      teams:       (sport_id, tournament, team) -> [elo, games, gf_w, ga_w, n_w, last_match_datetime_tr]
+      tournaments: (sport_id, tournament)       -> [home_goals_w, away_goals_w, n_w, matches]
+    """
+
+    def __init__(self):
+        self.teams: Dict[Tuple[int, str, str], list] = {}
+        self.tournaments: Dict[Tuple[int, str], list] = {}
+
+    def _team(self, key):
+        t = self.teams.get(key)
+        if t is None:
+            t = [ELO_INIT, 0, 0.0, 0.0, 0.0, None]
+            self.teams[key] = t
+        return t
+
+    def _tournament(self, key):
+        t = self.tournaments.get(key)
+        if t is None:
+            t = [0.0, 0.0, 0.0, 0]
+            self.tournaments[key] = t
+        return t
+
+    def apply(self, rows) -> Tuple[int, Optional[str]]:
+        """
+        rows: (sport_id, tournament_name, home, away, ft_home, ft_away, match_datetime_tr),
+        kronolojik sırada. Elo yol bağımlı olduğu için tek geçişte sırayla uygulanır.
+        Zaman damgaları geri gitmez: takım ve dönen last_dt işlenen en yeni maçtır.
+        """
+        td, ld = POISSON_TEAM_DECAY, POISSON_LEAGUE_DECAY
+        n = 0
+        last_dt = None
+        for sport_id, tournament, home, away, fh, fa, mdt in rows:
+            h = self._team((sport_id, tournament, home))
+            a = self._team((sport_id, tournament, away))
+            lg = self._tournament((sport_id, tournament))
+
+            # Elo
+            score = 1.0 if fh > fa else (0.5 if fh == fa else 0.0)
+            delta = ELO_K * _elo_goal_multiplier(fh - fa) * (score - _elo_expected_home(h[0], a[0]))
+            h[0] += delta
+            a[0] -= delta
+
+            # Poisson (üstel ağırlıklı gol oranları)
+            h[1] += 1
+            h[2] = h[2] * td + fh
+            h[3] = h[3] * td + fa
+            h[4] = h[4] * td + 1.0
+            h[5] = _max_dt(h[5], mdt)
+            a[1] += 1
+            a[2] = a[2] * td + fa
+            a[3] = a[3] * td + fh
+            a[4] = a[4] * td + 1.0
+            a[5] = _max_dt(a[5], mdt)
+
+            lg[0] = lg[0] * ld + fh
+            lg[1] = lg[1] * ld + fa
+            lg[2] = lg[2] * ld + 1.0
+            lg[3] += 1
+
+            n += 1
+            last_dt = _max_dt(last_dt, mdt)
+        return n, last_dt
+
+def _require_rated_sport(sport_id: int) -> None:
+    if sport_id not in RATING_SPORT_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sport_id={sport_id} rating modelinde yok (RATING_SPORT_IDS: {sorted(RATING_SPORT_IDS)})",
+        )
+
+def _rating_rows(result):
+    for r in result:
+        if r.sport_id not in RATING_SPORT_IDS:
+            continue
+        if r.home is None or r.away is None or r.ft_home is None or r.ft_away is None:
+            continue
+        yield (int(r.sport_id), r.tournament_name or "", r.home, r.away, int(r.ft_home), int(r.ft_away), r.match_datetime_tr)
+
+def _ratings_load_state(conn, rows: list) -> RatingState:
+    """Sadece bu maçlarda geçen takım/turnuvaların state'ini PK üzerinden yükler."""
+    state = RatingState()
+    team_keys = sorted({(r[0], r[1], r[2]) for r in rows} | {(r[0], r[1], r[3]) for r in rows})
+    tour_keys = sorted({(r[0], r[1]) for r in rows})
+
+    for t in conn.execute(
+        text("""
+            SELECT tr.sport_id, tr.tournament_name, tr.team, tr.elo, tr.games, tr.gf_w, tr.ga_w, tr.n_w, tr.last_match_datetime_tr
+            FROM team_ratings tr
+            JOIN unnest(CAST(:s AS int[]), CAST(:t AS text[]), CAST(:n AS text[])) AS k(sport_id, tournament_name, team)
+              ON tr.sport_id = k.sport_id AND tr.tournament_name = k.tournament_name AND tr.team = k.team
+        """),
+        {"s": [k[0] for k in team_keys], "t": [k[1] for k in team_keys], "n": [k[2] for k in team_keys]},
+    ):
+        state.teams[(t.sport_id, t.tournament_name, t.team)] = [t.elo, t.games, t.gf_w, t.ga_w, t.n_w, t.last_match_datetime_tr]
+
+    for t in conn.execute(
+        text("""
+            SELECT ts.sport_id, ts.tournament_name, ts.home_goals_w, ts.away_goals_w, ts.n_w, ts.matches
+            FROM tournament_rating_stats ts
+            JOIN unnest(CAST(:s AS int[]), CAST(:t AS text[])) AS k(sport_id, tournament_name)
+              ON ts.sport_id = k.sport_id AND ts.tournament_name = k.tournament_name
+        """),
+        {"s": [k[0] for k in tour_keys], "t": [k[1] for k in tour_keys]},
+    ):
+        state.tournaments[(t.sport_id, t.tournament_name)] = [t.home_goals_w, t.away_goals_w, t.n_w, t.matches]
+
+    return state
+
+def _ratings_save_state(conn, state: RatingState) -> None:
+    if state.teams:
+        conn.execute(
+            text("""
+                INSERT INTO team_ratings (
+                    sport_id, tournament_name, team, elo, games, gf_w, ga_w, n_w, last_match_datetime_tr, updated_at
+                )
+                VALUES (:sport_id, :tournament_name, :team, :elo, :games, :gf_w, :ga_w, :n_w, :last_dt, NOW())
+                ON CONFLICT (sport_id, tournament_name, team) DO UPDATE SET
+                    elo = EXCLUDED.elo,
+                    games = EXCLUDED.games,
+                    gf_w = EXCLUDED.gf_w,
+                    ga_w = EXCLUDED.ga_w,
+                    n_w = EXCLUDED.n_w,
+                    last_match_datetime_tr = EXCLUDED.last_match_datetime_tr,
+                    updated_at = NOW()
+            """),
+            [
+                {
+                    "sport_id": k[0], "tournament_name": k[1], "team": k[2],
+                    "elo": v[0], "games": v[1], "gf_w": v[2], "ga_w": v[3], "n_w": v[4], "last_dt": v[5],
+                }
+                for k, v in state.teams.items()
+            ],
+        )
+    if state.tournaments:
+        conn.execute(
+            text("""
+                INSERT INTO tournament_rating_stats (
+                    sport_id, tournament_name, home_goals_w, away_goals_w, n_w, matches, updated_at
+                )
+                VALUES (:sport_id, :tournament_name, :home_goals_w, :away_goals_w, :n_w, :matches, NOW())
+                ON CONFLICT (sport_id, tournament_name) DO UPDATE SET
+                    home_goals_w = EXCLUDED.home_goals_w,
+                    away_goals_w = EXCLUDED.away_goals_w,
+                    n_w = EXCLUDED.n_w,
+                    matches = EXCLUDED.matches,
+                    updated_at = NOW()
+            """),
+            [
+                {
+                    "sport_id": k[0], "tournament_name": k[1],
+                    "home_goals_w": v[0], "away_goals_w": v[1], "n_w": v[2], "matches": v[3],
+                }
+                for k, v in state.tournaments.items()
+            ],
+        )
+
+def _ratings_checkpoint(
+    conn,
+    processed: int,
+    last_dt: Optional[str],
+    *,
+    reset: bool = False,
+    rebuild_required: bool = False,
+) -> bool:
+    """Checkpoint'i günceller; rebuild_required bayrağının son halini döner (rebuild'e kadar yapışkan)."""
+    return conn.execute(
+        text(f"""
+            INSERT INTO rating_checkpoints (engine, processed, last_match_datetime_tr, params_json, rebuild_required, last_run_at)
+            VALUES (:engine, :processed, :last_dt, :params_json, :rebuild_required, NOW())
+            ON CONFLICT (engine) DO UPDATE SET
+                processed = {"EXCLUDED.processed" if reset else "rating_checkpoints.processed + EXCLUDED.processed"},
+                last_match_datetime_tr = GREATEST(
+                    {"NULL" if reset else "rating_checkpoints.last_match_datetime_tr"},
+                    EXCLUDED.last_match_datetime_tr
+                ),
+                params_json = EXCLUDED.params_json,
+                rebuild_required = {"EXCLUDED.rebuild_required" if reset else "rating_checkpoints.rebuild_required OR EXCLUDED.rebuild_required"},
+                last_run_at = NOW()
+            RETURNING rebuild_required
+        """),
+        {
+            "engine": RATING_ENGINE_NAME,
+            "processed": processed,
+            "last_dt": last_dt,
+            "params_json": _dump_json(_rating_params()),
+            "rebuild_required": rebuild_required,
+        },
+    ).scalar()
+
+def ratings_update_incremental(*, wait: bool = True) -> dict:
+    """
+    Henüz işlenmemiş (rated_at IS NULL) sonuçları mevcut state'e uygular.
+    wait=False: başka bir güncelleme kilidi tutuyorsa beklemeden çıkar.
+
+    Elo sıraya bağlıdır: checkpoint'teki son maçtan eski sonuçlar (paralel backfill'de
+    tarihler sırasız commit'lenir) yine uygulanır ama checkpoint'e rebuild_required
+    yazılır; bayrak ratings_rebuild() çalışana kadar kalkmaz.
+
+    Checkpoint yoksa (geçmiş hiç işlenmemiş, örn. migrate edilmiş DB) çalışmaz: tüm geçmişi
+    sync isteği içinde belleğe almak yerine `python manage.py rebuild-ratings` (stream eder)
+    gerekir. Tek turda en fazla RATINGS_INCREMENTAL_BATCH maç işlenir.
+    """
+    ensure_schema()
+    t0 = time.perf_counter()
+
+    with engine.begin() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _RATINGS_LOCK_KEY})
+        elif not conn.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _RATINGS_LOCK_KEY}).scalar():
+            return {"ok": True, "skipped": "locked"}
+
+        cp = conn.execute(
+            text("SELECT last_match_datetime_tr FROM rating_checkpoints WHERE engine = :engine"),
+            {"engine": RATING_ENGINE_NAME},
+        ).first()
+        if cp is None:
+            return {
+                "ok": True,
+                "skipped": "no_checkpoint",
+                "rebuild_required": True,
+                "hint": "python manage.py rebuild-ratings",
+            }
+        cp_last_dt = cp.last_match_datetime_tr
+
+        # işaretleme + okuma tek statement: eşzamanlı insert'ler ya burada ya sonraki turda işlenir
+        result = conn.execute(
+            text("""
+                UPDATE flash_finished_ms
+                SET rated_at = NOW()
+                WHERE rated_at IS NULL
+                  AND id IN (
+                      SELECT id FROM flash_finished_ms
+                      WHERE rated_at IS NULL
+                      ORDER BY match_datetime_tr, id
+                      LIMIT :batch
+                  )
+                RETURNING id, sport_id, tournament_name, home, away, ft_home, ft_away, match_datetime_tr
+            """),
+            {"batch": RATINGS_INCREMENTAL_BATCH},
+        ).all()
+        result.sort(key=lambda r: (r.match_datetime_tr or "", r.id))
+        rows = list(_rating_rows(result))
+
+        out_of_order = sum(1 for r in rows if cp_last_dt and r[6] and r[6] < cp_last_dt)
+
+        applied, last_dt = 0, None
+        if rows:
+            state = _ratings_load_state(conn, rows)
+            applied, last_dt = state.apply(rows)
+            _ratings_save_state(conn, state)
+        rebuild_required = _ratings_checkpoint(conn, applied, last_dt, rebuild_required=out_of_order > 0)
+
+    return {
+        "ok": True,
+        "applied": applied,
+        "out_of_order": out_of_order,
+        "rebuild_required": rebuild_required,
+        "more_pending": len(result) >= RATINGS_INCREMENTAL_BATCH,
+        "last_match_datetime_tr": last_dt,
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+def ratings_rebuild() -> dict:
+    """Tüm geçmişi kronolojik sırada baştan işler ve state'i yeniden yazar."""
+    ensure_schema()
+    t0 = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _RATINGS_LOCK_KEY})
+        conn.execute(text("UPDATE flash_finished_ms SET rated_at = NOW() WHERE rated_at IS NULL"))
+
+        result = conn.execution_options(stream_results=True, yield_per=50000).execute(text("""
+            SELECT sport_id, tournament_name, home, away, ft_home, ft_away, match_datetime_tr
+            FROM flash_finished_ms
+            WHERE rated_at IS NOT NULL AND sport_id = ANY(:sport_ids)
+            ORDER BY match_datetime_tr, id
+        """), {"sport_ids": sorted(RATING_SPORT_IDS)})
+        state = RatingState()
+        applied, last_dt = state.apply(_rating_rows(result))
+
+        conn.execute(text("DELETE FROM team_ratings"))
+        conn.execute(text("DELETE FROM tournament_rating_stats"))
+        _ratings_save_state(conn, state)
+        _ratings_checkpoint(conn, applied, last_dt, reset=True)
+
+    return {
+        "ok": True,
+        "applied": applied,
+        "teams": len(state.teams),
+        "tournaments": len(state.tournaments),
+        "last_match_datetime_tr": last_dt,
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+def _poisson_1x2(lam_home: float, lam_away: float) -> Dict[str, float]:
+    """Bağımsız Poisson skor matrisi -> 1 / X / 2 olasılıkları (POISSON_MAX_GOALS'a kadar)."""
+    ph = np.exp(_POISSON_GOALS * math.log(lam_home) - lam_home - _POISSON_LOG_FACT)
+    pa = np.exp(_POISSON_GOALS * math.log(lam_away) - lam_away - _POISSON_LOG_FACT)
+    m = np.outer(ph, pa)
+    total = float(m.sum())
+    return {
+        "p1": float(np.tril(m, -1).sum()) / total,
+        "p0": float(np.trace(m)) / total,
+        "p2": float(np.triu(m, 1).sum()) / total,
+    }
+
+def ratings_predict(conn, *, sport_id: int, tournament: str, home: str, away: str) -> dict:
+    rows = conn.execute(
+        text("""
+            SELECT team, elo, games, gf_w, ga_w, n_w
+            FROM team_ratings
+            WHERE sport_id = :sport_id AND tournament_name = :tournament AND team IN (:home, :away)
+        """),
+        {"sport_id": sport_id, "tournament": tournament, "home": home, "away": away},
+    ).mappings().all()
+    teams = {r["team"]: dict(r) for r in rows}
+
+    lg = conn.execute(
+        text("""
+            SELECT home_goals_w, away_goals_w, n_w, matches
+            FROM tournament_rating_stats
+            WHERE sport_id = :sport_id AND tournament_name = :tournament
+        """),
+        {"sport_id": sport_id, "tournament": tournament},
+    ).mappings().first()
+    if lg is None or not lg["n_w"]:
+        raise HTTPException(status_code=404, detail=f"turnuva için rating yok: {tournament}")
+
+    home_avg = lg["home_goals_w"] / lg["n_w"]
+    away_avg = lg["away_goals_w"] / lg["n_w"]
+    league_avg = (home_avg + away_avg) / 2.0 or 1.0
+
+    def strength(t: Optional[dict]) -> Tuple[float, float]:
+        # az maçlı takımlar lig ortalamasına (1.0) çekilir
+        gf_w, ga_w, n_w = (t["gf_w"], t["ga_w"], t["n_w"]) if t else (0.0, 0.0, 0.0)
+        prior = POISSON_PRIOR_MATCHES
+        att = (gf_w + prior * league_avg) / (n_w + prior) / league_avg
+        dfn = (ga_w + prior * league_avg) / (n_w + prior) / league_avg
+        return att, dfn
+
+    h, a = teams.get(home), teams.get(away)
+    att_h, def_h = strength(h)
+    att_a, def_a = strength(a)
+    lam_home = max(1e-6, home_avg * att_h * def_a)
+    lam_away = max(1e-6, away_avg * att_a * def_h)
+
+    elo_h = h["elo"] if h else ELO_INIT
+    elo_a = a["elo"] if a else ELO_INIT
+
+    return {
+        "sport_id": sport_id,
+        "tournament_name": tournament,
+        "home": {"team": home, "elo": elo_h, "games": h["games"] if h else 0, "attack": att_h, "defence": def_h},
+        "away": {"team": away, "elo": elo_a, "games": a["games"] if a else 0, "attack": att_a, "defence": def_a},
+        "elo_expected_home": _elo_expected_home(elo_h, elo_a),
+        "xg_home": lam_home,
+        "xg_away": lam_away,
+        "model": _poisson_1x2(lam_home, lam_away),
+    }
+
+@app.post("/ratings/rebuild", tags=["Ratings"])
+def ratings_rebuild_endpoint():
+    return ratings_rebuild()
+
+@app.post("/ratings/update", tags=["Ratings"])
+def ratings_update_endpoint():
+    return ratings_update_incremental(wait=True)
+
+@app.get("/ratings/status", tags=["Ratings"])
+def ratings_status():
+    ensure_schema()
+    with engine.begin() as conn:
+        cp = conn.execute(
+            text("SELECT * FROM rating_checkpoints WHERE engine = :engine"),
+            {"engine": RATING_ENGINE_NAME},
+        ).mappings().first()
+        pending = conn.execute(
+            text("SELECT COUNT(*)::int FROM flash_finished_ms WHERE rated_at IS NULL")
+        ).scalar() or 0
+    return {"ok": True, "checkpoint": dict(cp) if cp else None, "pending": pending}
+
+@app.get("/ratings/teams", tags=["Ratings"])
+def ratings_teams(
+    tournament: Optional[str] = Query(None, description="Tam turnuva adı, örn: ENGLAND: Premier League"),
+    team: Optional[str] = Query(None, description="Takım adı"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1),
+    limit: int = Query(100, ge=1, le=5000),
+):
+    ensure_schema()
+    _require_rated_sport(sport_id)
+
+    where = ["sport_id = :sport_id"]
+    params: Dict[str, Any] = {"sport_id": sport_id, "limit": limit}
+    if tournament is not None:
+        where.append("tournament_name = :tournament")
+        params["tournament"] = tournament
+    if team:
+        where.append("team = :team")
+        params["team"] = team
+
+    sql = text(f"""
+        SELECT sport_id, tournament_name, team, elo, games, gf_w, ga_w, n_w, last_match_datetime_tr, updated_at
+        FROM team_ratings
+        WHERE {" AND ".join(where)}
+        ORDER BY elo DESC
+        LIMIT :limit
+    """)
+    with engine.begin() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    return {"ok": True, "count": len(rows), "items": [dict(r) for r in rows]}
+
+@app.get("/ratings/predict", tags=["Ratings"])
+def ratings_predict_endpoint(
+    home: str = Query(...),
+    away: str = Query(...),
+    tournament: str = Query(..., description="Tam turnuva adı"),
+    sport_id: int = Query(DEFAULT_SPORT_ID, ge=1),
+):
+    ensure_schema()
+    _require_rated_sport(sport_id)
+    with engine.begin() as conn:
+        pred = ratings_predict(conn, sport_id=sport_id, tournament=tournament, home=home, away=away)
+    return {"ok": True, **pred}
+
+@app.get("/ratings/match/{flash_match_id}", tags=["Ratings"])
+def ratings_match(flash_match_id: str):
+    """
+    DB'deki bir maç için model 1X2 olasılıkları ile marjı çıkarılmış p1/p0/p2'yi yan yana döner.
+    Not: güncel rating'ler kullanılır (maç zaten işlendiyse sonucu da içerir).
+    """
+    ensure_schema()
+    with engine.begin() as conn:
+        # önce günü çöz: match_date ile tek partition'a bakılır
+        match_date = conn.execute(
+            text("SELECT match_date FROM flash_match_ids WHERE flash_match_id = :id"),
+            {"id": flash_match_id},
+        ).scalar()
+        m = None
+        if match_date is not None:
+            m = conn.execute(
+                text("""
+                    SELECT
+                        flash_match_id, sport_id, tournament_name, home, away, ft_home, ft_away,
+                        ms1, ms0, ms2, p1, p0, p2, ms_overround, match_datetime_tr
+                    FROM flash_finished_ms
+                    WHERE flash_match_id = :id AND match_date = :match_date
+                """),
+                {"id": flash_match_id, "match_date": match_date},
+            ).mappings().first()
+        if m is None:
+            raise HTTPException(status_code=404, detail=f"maç bulunamadı: {flash_match_id}")
+        _require_rated_sport(m["sport_id"])
+        pred = ratings_predict(
+            conn,
+            sport_id=m["sport_id"],
+            tournament=m["tournament_name"] or "",
+            home=m["home"],
+            away=m["away"],
+        )
+
+    implied = None
+    if m["p1"] is not None:
+        implied = {"p1": m["p1"], "p0": m["p0"], "p2": m["p2"], "overround": m["ms_overround"]}
+
+    return {
+        "ok": True,
+        "match": dict(m),
+        "implied": implied,
+        **pred,
+    }
+
+# ==========================================================
+# RAW ARCHIVE / REPLAY
+# ==========================================================
+# flashscore_get her response'u (hata dahil) RAW_ARCHIVE_DIR'e yazar. Parse tarafında bir
+# hata düzeltildiğinde sync pipeline'ı arşivden (network'e çıkmadan) tekrar çalıştırılır.
+def _archive_latest(conn, source: str, endpoints: list, date_from: str, date_to: str) -> list:
+    """Her (endpoint, date) için en son başarılı arşiv kaydı."""
+    return conn.execute(
+        text("""
+            SELECT DISTINCT ON (endpoint, date)
+                endpoint, date, sha256, fetched_at, archive_root
+            FROM raw_api_archive
+            WHERE source = :source
+              AND endpoint = ANY(:endpoints)
+              AND date BETWEEN :date_from AND :date_to
+              AND (http_status IS NULL OR http_status < 400)
+            ORDER BY endpoint, date, fetched_at DESC
+        """),
+        {"source": source, "endpoints": endpoints, "date_from": date_from, "date_to": date_to},
+    ).mappings().all()
+
+def replay_flash_archive(
+    sport_ids: list,
+    date_from: str,
+    date_to: str,
+    *,
+    overwrite: bool = True,
+) -> dict:
+    """
+    Arşivlenmiş match/list response'larını flash_sync_date'ten tekrar geçirir (sıfır network çağrısı).
+    overwrite=True: mevcut satırlar yeniden parse edilen değerlerle güncellenir.
+    """
+    ensure_schema()
+    if not RAW_ARCHIVE_DIR:
+        raise HTTPException(status_code=500, detail="RAW_ARCHIVE_DIR kapalı")
+
+    d_from = _parse_ymd(date_from, "date_from").isoformat()
+    d_to = _parse_ymd(date_to, "date_to").isoformat()
+
+    endpoint_sport = {
+        _fs_matches_path("{date}", sid): sid
+        for sid in sport_ids
+    }
+
+    with engine.begin() as conn:
+        entries = _archive_latest(conn, "flashscore", list(endpoint_sport), d_from, d_to)
+
+    t0 = time.perf_counter()
+    items = []
+    totals = Counter()
+    for e in sorted(entries, key=lambda x: (x["date"], x["endpoint"])):
+        sport_id = endpoint_sport[e["endpoint"]]
+        # başka node'un diskine yazılmış dosya burada yok (ya da farklı bir dosya): okunmaz
+        if e["archive_root"] not in (None, RAW_ARCHIVE_ROOT):
+            items.append({
+                "sport_id": sport_id,
+                "date": e["date"],
+                "ok": False,
+                "error": f"arşiv başka node'da: {e['archive_root']} (bu process: {RAW_ARCHIVE_ROOT})",
+            })
+            totals["foreign_objects"] += 1
+            continue
+        try:
+            with span("archive.read"):
+                payload = load_archived_response(e["sha256"])
+        except (OSError, ValueError) as ex:
+            items.append({"sport_id": sport_id, "date": e["date"], "ok": False, "error": repr(ex)})
+            totals["missing_objects"] += 1
+            continue
+
+        res = flash_sync_date(
+            e["date"],
+            sport_id=sport_id,
+            payload=payload,
+            fetched_at_tr=e["fetched_at"].astimezone(TR_TZ).isoformat(),
+            overwrite=overwrite,
+        )
+        totals["inserted_new"] += res.get("inserted_new", 0)
+        totals["updated_existing"] += res.get("updated_existing", 0)
+        totals["unchanged_existing"] += res.get("unchanged_existing", 0)
+        totals["rated_changed"] += res.get("rated_changed", 0)
+        items.append({
+            "sport_id": sport_id,
+            "date": e["date"],
+            "ok": True,
+            "sha256": e["sha256"],
+            "api_total": res.get("api_total"),
+            "inserted_new": res.get("inserted_new"),
+            "updated_existing": res.get("updated_existing"),
+            "unchanged_existing": res.get("unchanged_existing"),
+        })
+
+    resp = {
+        "ok": True,
+        "sport_ids": sport_ids,
+        "date_from": d_from,
+        "date_to": d_to,
+        "shards": len(entries),
+        "totals": dict(totals),
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+        "items": items,
+    }
+    if totals["rated_changed"]:
+        # checkpoint'e rebuild_required yazıldı; güncellenen skorlar rating state'ine otomatik yansımaz
+        resp["rebuild_required"] = True
+        resp["hint"] = "python manage.py rebuild-ratings"
+    return resp
+
+@app.get("/archive/index", tags=["Archive"])
+def archive_index(
+    source: Optional[str] = Query(None, description="flashscore | nosy"),
+    endpoint: Optional[str] = Query(None, description="örn: match/list/1/{date}"),
+    date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    limit: int = Query(200, ge=1, le=5000),
+):
+    ensure_schema()
+
+    where = []
+    params: Dict[str, Any] = {"limit": limit}
+    if source:
+        where.append("source = :source")
+        params["source"] = source
+    if endpoint:
+        where.append("endpoint = :endpoint")
+        params["endpoint"] = endpoint
+    if date:
+        where.append("date = :date")
+        params["date"] = date
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    sql = text(f"""
+        SELECT id, source, endpoint, date, params_json, sha256, size_bytes, http_status, archive_root, fetched_at
+        FROM raw_api_archive
+        {where_sql}
+        ORDER BY fetched_at DESC
+        LIMIT :limit
+    """)
+    with engine.begin() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    return {"ok": True, "archive_root": RAW_ARCHIVE_ROOT, "count": len(rows), "items": [dict(r) for r in rows]}
+
+@app.post("/archive/replay/flashscore", tags=["Archive"])
+def archive_replay_flashscore(
+    date_from: str = Query(..., description="YYYY-MM-DD"),
+    date_to: str = Query(..., description="YYYY-MM-DD"),
+    sports: str = Query(str(DEFAULT_SPORT_ID), description="virgülle sport id listesi, örn: 1,2"),
+    overwrite: int = Query(1, ge=0, le=1, description="1=mevcut satırları yeniden parse edilmiş değerlerle güncelle"),
+):
+    return replay_flash_archive(_parse_sport_ids(sports), date_from, date_to, overwrite=bool(overwrite))
+
+# ==========================================================
+# PROFILING / SLOW REQUEST LOG
+# ==========================================================
+def _is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not _is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="admin token gerekli (X-Admin-Token)")
+
+def _store_profile(prof: dict) -> None:
+    """Profili request_profiles'a yazar; en yeni PROFILE_STORE_SIZE kayıt tutulur."""
+    try:
+        ensure_schema()
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO request_profiles (id, method, path, query, status_code, duration_ms, profile_json)
+                    VALUES (:id, :method, :path, :query, :status_code, :duration_ms, :profile_json)
+                """),
+                {
+                    "id": prof["id"],
+                    "method": prof["method"],
+                    "path": prof["path"],
+                    "query": prof["query"],
+                    "status_code": prof["status_code"],
+                    "duration_ms": prof["duration_ms"],
+                    "profile_json": _dump_json(prof),
+                },
+            )
+            conn.execute(
+                text("""
+                    DELETE FROM request_profiles
+                    WHERE id IN (
+                        SELECT id FROM request_profiles
+                        ORDER BY created_at DESC
+                        OFFSET :keep
+                    )
+                """),
+                {"keep": PROFILE_STORE_SIZE},
+            )
+    except Exception as e:
+        logger.warning("profile: %s yazılamadı: %r", prof["id"], e)
+
+def _write_slow_request(prof: dict) -> None:
+    try:
+        ensure_schema()
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO slow_request_log (trace_id, method, path, query, status_code, duration_ms, trace_json)
+                    VALUES (:trace_id, :method, :path, :query, :status_code, :duration_ms, :trace_json)
+                """),
+                {
+                    "trace_id": prof["id"],
+                    "method": prof["method"],
+                    "path": prof["path"],
+                    "query": prof["query"],
+                    "status_code": prof["status_code"],
+                    "duration_ms": prof["duration_ms"],
+                    "trace_json": _dump_json(prof),
+                },
+            )
+    except Exception as e:
+        logger.warning("slow-log: %s yazılamadı: %r", prof["id"], e)
+
+@app.middleware("http")
+async def _profiling_middleware(request: Request, call_next):
+    mode = request.query_params.get("profile") or request.headers.get("x-profile") or ""
+    want_profile = mode.lower() in ("1", "true", "inline")
+    if want_profile and not _is_admin(request.headers.get("x-admin-token")):
+        return JSONResponse(status_code=403, content={"detail": "profil sadece admin için (X-Admin-Token)"})
+
+    slow_log = SLOW_REQUEST_MS > 0 and engine is not None
+    if not want_profile and not slow_log:
+        return await call_next(request)
+
+    trace = RequestTrace(request.method, request.url.path, request.url.query, sampling=want_profile)
+    sampler = _StackSampler(trace, PROFILE_SAMPLE_INTERVAL_MS) if want_profile else None
+    token = _trace_var.set(trace)
+    if sampler is not None:
+        sampler.start()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        response = await call_next(request)
+        trace.status_code = response.status_code
+    except Exception as e:
+        # yakalanmamış hata: slow-log / profil yine yazılır, sonra tekrar fırlatılır
+        trace.status_code = 500
+        error = e
+    finally:
+        trace.root.total = time.perf_counter() - t0
+        trace.root.count = 1
+        _trace_var.reset(token)
+        if sampler is not None:
+            sampler.stop()
+
+    prof = trace.to_dict()
+    if error is not None:
+        prof["error"] = repr(error)
+    if slow_log and prof["duration_ms"] >= SLOW_REQUEST_MS:
+        await run_in_threadpool(_write_slow_request, prof)
+    if want_profile and engine is not None:
+        await run_in_threadpool(_store_profile, prof)
+    if error is not None:
+        raise error
+    if not want_profile:
+        return response
+
+    response.headers["X-Profile-Id"] = trace.id
+    response.headers["X-Profile-Duration-Ms"] = str(prof["duration_ms"])
+
+    if mode.lower() == "inline" and response.headers.get("content-type", "").startswith("application/json"):
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            payload["_profile"] = prof
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        return JSONResponse(content=payload, status_code=response.status_code, headers=headers)
+
+    return response
+
+@app.get("/admin/profiles", tags=["Admin"], dependencies=[Depends(_require_admin)])
+def admin_profiles():
+    ensure_schema()
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT id, method, path, query, status_code, duration_ms, created_at
+            FROM request_profiles
+            ORDER BY created_at DESC
+        """)).mappings().all()
+    items = [dict(r) for r in rows]
     return {"ok": True, "count": len(items), "items": items}
 
+@app.get("/admin/profiles/{profile_id}", tags=["Admin"], dependencies=[Depends(_require_admin)])
+def admin_profile(profile_id: str):
+    ensure_schema()
+    with engine.begin() as conn:
+        profile_json = conn.execute(
+            text("SELECT profile_json FROM request_profiles WHERE id = :id"),
+            {"id": profile_id},
+        ).scalar()
+    if profile_json is None:
+        raise HTTPException(status_code=404, detail=f"profil bulunamadı: {profile_id}")
+    return {"ok": True, "item": json.loads(profile_json)}
+
+@app.get("/admin/slow-requests", tags=["Admin"], dependencies=[Depends(_require_admin)])
+def admin_slow_requests(
+    path: Optional[str] = Query(None, description="Örn: /flashscore/db/finished-ms/sync-date"),
+    min_ms: Optional[float] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    include_trace: int = Query(0, ge=0, le=1, description="1=span ağacını da döndür"),
+):
+    ensure_schema()
+
+    where = []
+    params: Dict[str, Any] = {"limit": limit}
+    if path:
+        where.append("path = :path")
+        params["path"] = path
+    if min_ms is not None:
+        where.append("duration_ms >= :min_ms")
+        params["min_ms"] = min_ms
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    trace_col = ", trace_json" if include_trace else ""
+    sql = text(f"""
+        SELECT id, trace_id, method, path, query, status_code, duration_ms, created_at{trace_col}
+        FROM slow_request_log
+        {where_sql}
+        ORDER BY created_at DESC
+        LIMIT :limit
+    """)
+    with engine.begin() as conn:
+        rows = conn.execute(sql, params).mappings().all()
+
+    items = []
+    for r in rows:
+        d = dict(r)
+        if include_trace:
+            d["trace"] = json.loads(d.pop("trace_json"))
+        items.append(d)
 
+    return {"ok": True, "slow_request_ms": SLOW_REQUEST_MS, "count": len(items), "items": items}
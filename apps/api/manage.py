@@ -0,0 +1,85 @@
+# manage.py
+# Bakım komutları (API process'inden bağımsız çalıştırılabilir).
+#
+#   python manage.py migrate              # şemayı kurar / flash_finished_ms'i partition'lı yapıya taşır
+#                                         # (API / worker startup'ı veri taşımaz; eski şemada hata verir)
+#   python manage.py rebuild-features     # flash_team_features'ı tüm geçmişten yeniden kurar
+#   python manage.py rebuild-ratings      # Elo/Poisson state'ini tüm geçmişten yeniden hesaplar
+#   python manage.py update-ratings       # sadece işlenmemiş yeni sonuçları uygular
+#   python manage.py replay-flashscore --date-from 2024-01-01 --date-to 2024-12-31
+#                                         # arşivden (network'süz) sync-date pipeline'ını tekrar çalıştırır
+import argparse
+import json
+
+import main as api
+
+
+def cmd_migrate(args) -> dict:
+    api.ensure_schema(migrate=True)
+    with api.engine.begin() as conn:
+        partitions = conn.execute(api.text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'flash_finished_ms'
+            ORDER BY c.relname
+        """)).scalars().all()
+    return {"ok": True, "flash_finished_ms_partitions": partitions}
+
+
+def cmd_rebuild_features(args) -> dict:
+    return api.rebuild_team_features()
+
+
+def cmd_rebuild_ratings(args) -> dict:
+    return api.ratings_rebuild()
+
+
+def cmd_update_ratings(args) -> dict:
+    return api.ratings_update_incremental(wait=True)
+
+
+def cmd_replay_flashscore(args) -> dict:
+    return api.replay_flash_archive(
+        api._parse_sport_ids(args.sports),
+        args.date_from,
+        args.date_to,
+        overwrite=not args.no_overwrite,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="MatchMotor bakım komutları")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="şemayı kur / flash_finished_ms'i aylık partition'lara taşı")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("rebuild-features", help="flash_team_features'ı tüm geçmişten yeniden kur")
+    p.set_defaults(func=cmd_rebuild_features)
+
+    p = sub.add_parser("rebuild-ratings", help="Elo/Poisson rating'lerini tüm geçmişten yeniden hesapla")
+    p.set_defaults(func=cmd_rebuild_ratings)
+
+    p = sub.add_parser("update-ratings", help="yeni sonuçları rating'lere uygula (incremental)")
+    p.set_defaults(func=cmd_update_ratings)
+
+    p = sub.add_parser("replay-flashscore", help="arşivlenmiş Flashscore response'larını tekrar işle")
+    p.add_argument("--date-from", required=True)
+    p.add_argument("--date-to", required=True)
+    p.add_argument("--sports", default=str(api.DEFAULT_SPORT_ID), help="virgülle sport id listesi")
+    p.add_argument("--no-overwrite", action="store_true", help="mevcut satırlara dokunma, sadece eksikleri ekle")
+    p.set_defaults(func=cmd_replay_flashscore)
+
+    args = ap.parse_args()
+
+    if api.engine is None:
+        raise RuntimeError("DATABASE_URL missing")
+
+    res = args.func(args)
+    print(json.dumps(res, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
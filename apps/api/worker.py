@@ -0,0 +1,69 @@
+# worker.py
+# flash_ingest_queue worker'ı. Aynı anda birden fazla process / node çalıştırılabilir;
+# işler FOR UPDATE SKIP LOCKED ile alındığı için aynı shard iki kez işlenmez.
+#
+#   python worker.py                      # kuyruk boşalınca çıkar
+#   python worker.py --threads 4          # process içinde 4 paralel worker
+#   python worker.py --poll 30            # boşken 30 sn bekleyip tekrar dener (daemon)
+import argparse
+import time
+import datetime as dt
+
+from concurrent.futures import ThreadPoolExecutor
+
+from main import engine, ensure_schema, ingest_work, _default_worker_id
+
+
+MAX_CONSECUTIVE_ERRORS = 5
+
+
+def run_worker(max_items: int, poll: int) -> int:
+    worker_id = _default_worker_id()
+    total = 0
+    errors = 0
+    while True:
+        try:
+            res = ingest_work(worker_id=worker_id, max_items=(max_items - total) if max_items else 0)
+        except Exception as e:
+            # DB kesintisi vb.: bu thread'i (ve process'i) düşürme, bekleyip tekrar dene
+            errors += 1
+            print(f"[{dt.datetime.utcnow().isoformat()}] {worker_id} ERROR ({errors}/{MAX_CONSECUTIVE_ERRORS}) {e!r}")
+            if errors >= MAX_CONSECUTIVE_ERRORS:
+                return total
+            time.sleep(max(poll, 5) * errors)
+            continue
+        errors = 0
+
+        total += res["processed"]
+        for it in res["items"]:
+            print(f"[{dt.datetime.utcnow().isoformat()}] {worker_id} sport={it['sport_id']} date={it['date']} status={it['status']} inserted_new={it.get('inserted_new')}" + (f" error={it['error']}" if it.get("error") else ""))
+
+        if max_items and total >= max_items:
+            return total
+        if res["processed"] == 0:
+            if poll <= 0:
+                return total
+            time.sleep(poll)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="flash_ingest_queue worker")
+    ap.add_argument("--threads", type=int, default=1, help="process içi paralel worker sayısı")
+    ap.add_argument("--max-items", type=int, default=0, help="worker başına en fazla iş (0=limitsiz)")
+    ap.add_argument("--poll", type=int, default=0, help="kuyruk boşken bekleme (sn); 0=boşalınca çık")
+    args = ap.parse_args()
+
+    if engine is None:
+        raise RuntimeError("DATABASE_URL missing")
+    ensure_schema()
+
+    threads = max(1, args.threads)
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        futures = [ex.submit(run_worker, args.max_items, args.poll) for _ in range(threads)]
+        total = sum(f.result() for f in futures)
+
+    print(f"[{dt.datetime.utcnow().isoformat()}] DONE processed={total}")
+
+
+if __name__ == "__main__":
+    main()
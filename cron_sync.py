@@ -1,8 +1,17 @@
 # cron_sync.py
+#   python cron_sync.py                                   # bugün + yarın (Nosy API)
+#   python cron_sync.py --replay 2024-01-01 2024-01-31    # arşivden, network'süz
 import os
+import sys
+import gzip
+import json
+import socket
+import hashlib
 import datetime as dt
 import requests
 
+from pathlib import Path
+
 from sqlalchemy import create_engine, text
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -12,28 +21,124 @@ NOSY_ODDS_API_ID = os.getenv("NOSY_ODDS_API_ID")  # maç/odds tarafı için kull
 NOSY_SERVICE_BASE_URL = os.getenv("NOSY_SERVICE_BASE_URL")  # ör: https://www.nosyapi.com/apiv2/service
 NOSY_ROOT_BASE_URL = os.getenv("NOSY_ROOT_BASE_URL")        # ör: https://www.nosyapi.com/apiv2
 
+# ham response arşivi (apps/api/main.py ile aynı dizin ve raw_api_archive tablosu); "" => kapalı
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", str(Path(__file__).resolve().parent / "data" / "raw_archive")).strip()
+# çok node'lu kurulumda paylaşımlı RAW_ARCHIVE_DIR + her yerde aynı RAW_ARCHIVE_NODE (bkz. apps/api/main.py)
+RAW_ARCHIVE_NODE = (os.getenv("RAW_ARCHIVE_NODE") or socket.gethostname()).strip()
+RAW_ARCHIVE_ROOT = f"{RAW_ARCHIVE_NODE}:{RAW_ARCHIVE_DIR}"
+
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL missing")
-if not NOSY_API_KEY:
-    raise RuntimeError("NOSY_API_KEY missing")
-if not NOSY_ODDS_API_ID:
-    raise RuntimeError("NOSY_ODDS_API_ID missing")
-if not NOSY_SERVICE_BASE_URL:
-    raise RuntimeError("NOSY_SERVICE_BASE_URL missing")
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
+def require_nosy_config():
+    """Sadece canlı sync için gerekli; --replay network'e çıkmadığı için API bilgisi istemez."""
+    if not NOSY_API_KEY:
+        raise RuntimeError("NOSY_API_KEY missing")
+    if not NOSY_ODDS_API_ID:
+        raise RuntimeError("NOSY_ODDS_API_ID missing")
+    if not NOSY_SERVICE_BASE_URL:
+        raise RuntimeError("NOSY_SERVICE_BASE_URL missing")
+
+def ensure_archive_table():
+    """raw_api_archive şeması (apps/api/main.py ensure_schema ile aynı); process başına bir kez çağrılır."""
+    if not RAW_ARCHIVE_DIR:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS raw_api_archive (
+                id BIGSERIAL PRIMARY KEY,
+                source TEXT NOT NULL,      -- flashscore | nosy
+                endpoint TEXT NOT NULL,
+                date TEXT,
+                params_json TEXT,
+                sha256 TEXT NOT NULL,
+                size_bytes INT NOT NULL,
+                http_status INT,
+                fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """))
+        conn.execute(text("""ALTER TABLE raw_api_archive ADD COLUMN IF NOT EXISTS archive_root TEXT;"""))
+        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_raw_api_archive_lookup ON raw_api_archive(source, endpoint, date, fetched_at DESC);"""))
+
 def join_url(base: str, endpoint: str) -> str:
     base = base.rstrip("/")
     endpoint = endpoint.lstrip("/")
     return f"{base}/{endpoint}"
 
+def archive_object_path(sha256: str) -> Path:
+    return Path(RAW_ARCHIVE_DIR) / "objects" / sha256[:2] / f"{sha256}.json.gz"
+
+def archive_raw_response(endpoint: str, params: dict, content: bytes, http_status: int):
+    """
+    Ham Nosy response'unu sha256 ile adreslenmiş gzip dosyası olarak yazar + raw_api_archive index'i.
+    params içinde apiKey olmamalı.
+    """
+    if not RAW_ARCHIVE_DIR:
+        return None
+    try:
+        sha256 = hashlib.sha256(content).hexdigest()
+        obj = archive_object_path(sha256)
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_suffix(f".tmp{os.getpid()}")
+            with gzip.open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, obj)
+
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO raw_api_archive (source, endpoint, date, params_json, sha256, size_bytes, http_status, archive_root)
+                    VALUES ('nosy', :endpoint, :date, :params_json, :sha256, :size_bytes, :http_status, :archive_root)
+                """),
+                {
+                    "endpoint": endpoint,
+                    "date": params.get("date"),
+                    "params_json": json.dumps(params, ensure_ascii=False),
+                    "sha256": sha256,
+                    "size_bytes": len(content),
+                    "http_status": http_status,
+                    "archive_root": RAW_ARCHIVE_ROOT,
+                },
+            )
+        return sha256
+    except Exception as e:
+        print(f"[archive] nosy {endpoint} yazılamadı: {e!r}")
+        return None
+
+def load_archived_nosy(endpoint: str, date_s: str):
+    """
+    (endpoint, date) için en son başarılı arşivlenmiş response (yoksa None); hata response'ları atlanır.
+    Kayıt başka node'un arşivine aitse RuntimeError (dosya bu diskte değil).
+    """
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("""
+                SELECT sha256, fetched_at, archive_root
+                FROM raw_api_archive
+                WHERE source = 'nosy' AND endpoint = :endpoint AND date = :date
+                  AND (http_status IS NULL OR http_status < 400)
+                ORDER BY fetched_at DESC
+                LIMIT 1
+            """),
+            {"endpoint": endpoint, "date": date_s},
+        ).first()
+    if row is None:
+        return None, None
+    if row.archive_root not in (None, RAW_ARCHIVE_ROOT):
+        raise RuntimeError(f"arşiv başka node'da: {row.archive_root} (bu process: {RAW_ARCHIVE_ROOT})")
+    with gzip.open(archive_object_path(row.sha256), "rb") as f:
+        return json.loads(f.read()), row.fetched_at
+
 def nosy_get(endpoint: str, params: dict) -> dict:
     url = join_url(NOSY_SERVICE_BASE_URL, endpoint)
     q = dict(params)
     q["apiKey"] = NOSY_API_KEY
     q["apiID"] = NOSY_ODDS_API_ID
     r = requests.get(url, params=q, timeout=30)
+    archive_raw_response(endpoint, params, r.content, r.status_code)
     # Nosy bazen 200 içinde failure döndürebiliyor; json'u alıp biz bakacağız
     try:
         return r.json()
@@ -119,6 +224,8 @@ def upsert_nosy_matches(items: list, fetched_at: str):
     return len(rows)
 
 def main():
+    require_nosy_config()
+    ensure_archive_table()
     fetched_at = dt.datetime.utcnow().isoformat()
 
     today = dt.date.today()
@@ -135,5 +242,31 @@ def main():
 
     print(f"[{fetched_at}] DONE total_upsert_attempt={total}")
 
+def replay(date_from: dt.date, date_to: dt.date):
+    """Arşivdeki bettable-matches response'larını nosy_matches'e tekrar basar (network yok)."""
+    ensure_archive_table()
+    total = 0
+    d = date_from
+    while d <= date_to:
+        try:
+            payload, archived_at = load_archived_nosy("bettable-matches/date", d.isoformat())
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"[replay] date={d.isoformat()} okunamadı: {e!r}")
+            d += dt.timedelta(days=1)
+            continue
+        if payload is None:
+            print(f"[replay] date={d.isoformat()} arşiv yok")
+        else:
+            data = payload.get("data") or []
+            if isinstance(data, list) and data:
+                total += upsert_nosy_matches(data, fetched_at=archived_at.astimezone(dt.timezone.utc).replace(tzinfo=None).isoformat())
+            print(f"[replay] date={d.isoformat()} archived_at={archived_at.isoformat()} upserted={len(data) if isinstance(data,list) else 0}")
+        d += dt.timedelta(days=1)
+
+    print(f"[replay] DONE total_upsert_attempt={total}")
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) == 4 and sys.argv[1] == "--replay":
+        replay(dt.date.fromisoformat(sys.argv[2]), dt.date.fromisoformat(sys.argv[3]))
+    else:
+        main()